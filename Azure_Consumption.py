@@ -27,100 +27,89 @@ import streamlit as st
 from datetime import datetime, date, timedelta
 import plotly.express as px
 from pathlib import Path
-from snowflake.snowpark import Session
-
 import snowflake.snowpark as snowpark
 from configparser import ConfigParser
 import streamlit_authenticator as stauth
 from streamlit_authenticator.utilities.hasher import Hasher
 
+from datasource import get_backend
+
+# finest grain any chart needs; the rest are rollups of this cube
+CUBE_DIMS = ["USAGEDATE", "SUBSCRIPTION", "CATEGORY", "RESOURCEGROUP"]
+
 
 @st.cache_data
 def sum_daily_subscription(df):
     return df.groupby(["USAGEDATE", "SUBSCRIPTION"], as_index=False).COST.sum()
 
 
-@st.cache_data
-def load_data():
-    connection_parameters = {
-        "user": st.secrets.connections.snowflake.user,
-        "password": st.secrets.connections.snowflake.password,
-        "account": st.secrets.connections.snowflake.account,
-        "role": st.secrets.connections.snowflake.role,
-        "warehouse": st.secrets.connections.snowflake.warehouse,
-        "database": st.secrets.connections.snowflake.database,
-        "schema": st.secrets.connections.snowflake.schema,
-    }
-    session = Session.builder.configs(connection_parameters).create()
-    df = session.sql("select * from AZURECONSUMPTION").to_pandas()
-    session.close()
-    return df
-
+@st.cache_resource
+def load_cube():
+    """COST summed over CUBE_DIMS. Every chart on the page is a rollup of this,
+    so reruns never go back to the raw usage rows."""
+    # summed where the backend keeps the data: in Snowflake with pushdown,
+    # otherwise from the local snapshot or the workbooks
+    return add_report_date(get_backend().aggregate("azure_usage", CUBE_DIMS, "COST"))
 
-@st.cache_data
-def load_data2():
-    # config = ConfigParser()
-    # config.read("config.ini")
-    # path = config["azure"]["path"]
-    path = st.secrets.azure.path
-
-    def load_monthly(file):
-        _df = pd.read_excel(
-            file,
-            skiprows=2,
-            usecols=["Category", "Subscription", "Cost", "UsageDate", "Resource Group"],
-            engine="openpyxl",
-            dtype={"Cost": "float16"},
-        )
 
-        # change 'QR Core Production'==>'Beta'; and 'QR Core POC'==>'Production'
+def add_report_date(df):
+    usagedate = df["USAGEDATE"].astype("datetime64[ns]")
+    return df.assign(USAGEDATE=usagedate, REPORTDATE=usagedate.dt.strftime("%Y-%m"))
 
-        _df.loc[_df.Subscription == "QR Core Production", "Subscription"] = "Beta"
-        _df.loc[_df.Subscription != "Beta", "Subscription"] = "Production"
-        return _df
 
-    arr = sorted(Path(path).glob("Azure Usage 2024-*.xlsx"))
-    arr_df = [load_monthly(el) for el in arr]
+def remaining_days_of_the_month(ts):
+    today = ts.date()
+    next_month = date(today.year, today.month, 28) + timedelta(days=4)
+    return (next_month - timedelta(days=next_month.day) - today).days
 
-    file_name = Path(path) / "Azure Usage Jan to Dec 2023.xlsx"
 
-    df_since_2023 = pd.read_excel(
-        file_name,
-        skiprows=2,
-        usecols=["Category", "Subscription", "Cost", "UsageDate", "Resource Group"],
-        engine="openpyxl",
-        dtype={"Cost": "float16"},
+def monthly_daily_average(df, arr_dates):
+    """Average daily COST per subscription, plus their Total, for the four
+    latest months of `arr_dates` (newest first)."""
+    arr_arr = []
+    for i in range(0, 4):
+        arr_arr.append(df.loc[(df.REPORTDATE == arr_dates[i])])
+
+    _df1 = pd.concat(arr_arr)
+
+    _df2 = (
+        _df1.groupby(["REPORTDATE", "USAGEDATE", "SUBSCRIPTION"], as_index=False)
+        .COST.sum()
+        .groupby(
+            [
+                "REPORTDATE",
+                # pd.Grouper(key="USAGEDATE", freq="1M"),
+                "SUBSCRIPTION",
+            ],
+            as_index=False,
+        )
+        .COST.mean()
     )
 
-    # change 'QR Core Production'==>'Production'; and 'QR Core POC'==>'Beta'
-    df_since_2023.loc[
-        df_since_2023.Subscription == "QR Core Production", "Subscription"
-    ] = "Production"
-    df_since_2023.loc[df_since_2023.Subscription != "Production", "Subscription"] = (
-        "Beta"
-    )
+    _df3 = _df2.groupby(["REPORTDATE"], as_index=False).COST.sum()
+    _df3["SUBSCRIPTION"] = "Total"
 
-    arr_df.append(df_since_2023)  ## add 2023
-
-    _df = pd.concat(arr_df)
-    # _df = _df.dropna(how="any")
-    # _df["Category"] = _df["Category"].astype("category")
-    _df = _df.rename(
-        columns={
-            "Category": "CATEGORY",
-            "Subscription": "SUBSCRIPTION",
-            "Cost": "COST",
-            "UsageDate": "USAGEDATE",
-            "Resource Group": "RESOURCEGROUP",
-        }
-    )
-    return _df
+    _df2 = pd.concat([_df2, _df3])
+    _df2.sort_values(["REPORTDATE"], inplace=True)
+    return _df2
 
 
-def remaining_days_of_the_month(ts):
-    today = ts.date()
-    next_month = date(today.year, today.month, 28) + timedelta(days=4)
-    return (next_month - timedelta(days=next_month.day) - today).days
+def eom_forecast(df, daily_average):
+    """Days left in the latest month, its total so far, and the total by the
+    end of it at the latest daily average (see monthly_daily_average)."""
+    # get the lastest total amount
+    current_total = df.groupby(
+        pd.Grouper(key="USAGEDATE", freq="1ME")
+    ).sum()["COST"].iloc[-1]
+
+    remaining_days = remaining_days_of_the_month(df.USAGEDATE.max())
+
+    latest_total_ave = daily_average["COST"].tolist()[-1]
+
+    balance = remaining_days * latest_total_ave
+
+    total_by_eom = balance + current_total
+    return remaining_days, current_total, total_by_eom
 
 
 def plot_the_chart_combined(df):
@@ -276,23 +265,29 @@ def main():
     # config = ConfigParser()
     # config.read("config.ini")
 
-    # if config["datasource"]["source"] == "2":
-    if st.secrets.datasource.source == 2:
-        df_since_2023 = load_data2()
-    else:
-        df_since_2023 = load_data()
+    source = get_backend()
+
+    if st.sidebar.button("Refresh data"):
+        # new rows into the backend's local copy (snapshot or store), if it
+        # keeps one, then the cube is summed again from that copy without
+        # another round trip
+        source.refresh("azure_usage")
+        load_cube.clear()
 
-    df_since_2023["USAGEDATE"] = df_since_2023["USAGEDATE"].astype("datetime64[ns]")
-    df_since_2023["REPORTDATE"] = df_since_2023["USAGEDATE"].dt.strftime("%Y-%m")
+    if st.sidebar.button("Full reload"):
+        source.refresh("azure_usage", full=True)
+        load_cube.clear()
 
+    df_since_2023 = load_cube()
+
+    # df_since_2023 is the cost cube (see load_cube), sorted by CUBE_DIMS
+    lst = df_since_2023["RESOURCEGROUP"].dropna().unique().tolist()
+
+    # every month with usage, before the resource-group filter
     arr_desc_report_dates = df_since_2023.sort_values(
         ["USAGEDATE"], ascending=False
     ).REPORTDATE.unique()
 
-    lst = df_since_2023["RESOURCEGROUP"].unique().tolist()
-    if lst[-1] is None:
-        lst.pop()
-
     azure_container = st.container()
     with azure_container:
         ##########################################
@@ -430,7 +425,7 @@ def main():
             ###########################################################
 
             def get_subset(subscription, report_date):
-                return df_since_2023.copy().loc[
+                return df_since_2023.loc[
                     # (df_since_2023.Subscription == subscription) &
                     (df_since_2023.REPORTDATE == report_date)
                 ]
@@ -501,37 +496,7 @@ def main():
 
             st.header("Monthly Daily Average")
 
-            arr_arr = []
-            for i in range(0, 4):
-                arr_arr.append(
-                    df_since_2023.loc[
-                        (df_since_2023.REPORTDATE == arr_desc_report_dates[i])
-                    ]
-                )
-
-            _df1 = pd.concat(arr_arr)
-
-            _df2 = (
-                _df1.groupby(
-                    ["REPORTDATE", "USAGEDATE", "SUBSCRIPTION"], as_index=False
-                )
-                .COST.sum()
-                .groupby(
-                    [
-                        "REPORTDATE",
-                        # pd.Grouper(key="USAGEDATE", freq="1M"),
-                        "SUBSCRIPTION",
-                    ],
-                    as_index=False,
-                )
-                .COST.mean()
-            )
-
-            _df3 = _df2.groupby(["REPORTDATE"], as_index=False).COST.sum()
-            _df3["SUBSCRIPTION"] = "Total"
-
-            _df2 = pd.concat([_df2, _df3])
-            _df2.sort_values(["REPORTDATE"], inplace=True)
+            _df2 = monthly_daily_average(df_since_2023, arr_desc_report_dates)
 
             fig = px.bar(
                 _df2,
@@ -549,21 +514,9 @@ def main():
 
             st.plotly_chart(fig, use_container_width=True, height=200)
 
-            # get the lastest total amount
-            current_total = df_since_2023.groupby(
-                pd.Grouper(key="USAGEDATE", freq="1ME")
-            ).sum()["COST"].iloc[-1]
-            # current_total = df_since_2023.groupby(
-            #     pd.Grouper(key="USAGEDATE", freq="1ME")
-            # ).sum()["COST"][-1]
-
-            remaining_days = remaining_days_of_the_month(dt2)
-
-            latest_total_ave = _df2["COST"].tolist()[-1]
-
-            balance = remaining_days * latest_total_ave
-
-            total_by_eom = balance + current_total
+            remaining_days, current_total, total_by_eom = eom_forecast(
+                df_since_2023, _df2
+            )
 
             # msg = f"With {remaining_days} remaining days till EOM and at ${latest_total_ave:.2f} ave by EOM the estimated total will be ${total_by_eom:.2f}"
             # f"Estimated by EOM ${total_by_eom:.2f}"
@@ -579,7 +532,7 @@ def main():
             #
             ###########################################################
 
-            _df = df_since_2023.copy().groupby(["USAGEDATE"], as_index=False).COST.sum()
+            _df = df_since_2023.groupby(["USAGEDATE"], as_index=False).COST.sum()
             _df["Avg"] = _df["COST"].rolling(window=7).mean()
             _df = _df.loc[(_df.USAGEDATE >= "2024-02-01")]
 
@@ -718,5 +671,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,11 @@ p3 = st.Page("pages/04_MS-Sponsorship.py", title="12K MS Sponsorship")
 p4 = st.Page("pages/04_MS-Sponsorship_2nd.py", title="150K MS Sponsorship")
 p5 = st.Page("pages/05_Xamun-Resources.py", title="Xamun Resources")
 
-pg = st.navigation([p0, p1, p2, p3, p4, p5])
-if not check_password():
-    st.stop()  # Do not continue if check_password is not True.
+# Streamlit runs scripts as __main__; worker processes spawned by
+# read_excel_many re-run the entry script as __mp_main__ and must not render
+if __name__ == "__main__":
+    pg = st.navigation([p0, p1, p2, p3, p4, p5])
+    if not check_password():
+        st.stop()  # Do not continue if check_password is not True.
 
-pg.run()
+    pg.run()
@@ -0,0 +1,57 @@
+"""
+bench_azure.py
+Azure Consumption: the cost cube, its rollups and the page rerun, which
+includes the end-of-month forecast and every toggled section.
+"""
+
+import pandas as pd
+import pytest
+
+LAST_MONTH = (pd.Timestamp.today() - pd.DateOffset(months=1)).strftime("%Y-%m")
+
+
+def report_dates(cube):
+    return cube.REPORTDATE.sort_values(ascending=False).unique()
+
+
+@pytest.fixture(scope="module")
+def page(open_page):
+    return open_page("Azure_Consumption.py", {"Period (YYYY-MM)": LAST_MONTH})
+
+
+@pytest.fixture(scope="module")
+def cube(page):
+    return page.load_cube()
+
+
+def bench_load_cube(benchmark, page):
+    df = benchmark(page.load_cube.__wrapped__)
+    assert list(df.columns) == page.CUBE_DIMS + ["COST", "REPORTDATE"]
+
+
+def bench_sum_daily_subscription(benchmark, page, cube):
+    benchmark(page.sum_daily_subscription.__wrapped__, cube)
+
+
+def bench_top_consumers(benchmark, page, cube):
+    def top_consumers():
+        page.chart_top_consumers("Beta", cube, report_dates(cube))
+        page.chart_top_consumers("Production", cube, report_dates(cube))
+
+    benchmark(top_consumers)
+
+
+def bench_monthly_daily_average(benchmark, page, cube):
+    benchmark(page.monthly_daily_average, cube, report_dates(cube))
+
+
+def bench_eom_forecast(benchmark, page, cube):
+    daily_average = page.monthly_daily_average(cube, report_dates(cube))
+    remaining_days, current_total, total_by_eom = benchmark(
+        page.eom_forecast, cube, daily_average
+    )
+    assert total_by_eom >= current_total
+
+
+def bench_page(rerun, page):
+    rerun(page)
@@ -0,0 +1,48 @@
+"""
+bench_datasource.py
+Every backend serving the same datasets: whole loads, the page 01 batch and
+the Azure cost cube. Excel is timed from its Parquet sidecars once the first
+read has parsed the workbooks, and only with --mis-xlsx.
+"""
+
+import pytest
+
+import datasource
+
+AZURE_CUBE = ["USAGEDATE", "SUBSCRIPTION", "CATEGORY", "RESOURCEGROUP"]
+PAGE_01 = [
+    ("sales", None, [("PROJECT", "not null", None)]),
+    ("holidays", None, ()),
+    ("invoices", None, ()),
+]
+
+
+@pytest.fixture(
+    scope="module", params=["snowflake", "snowflake-pushdown", "parquet", "duckdb", "excel"]
+)
+def backend(request, pytestconfig, mis_dir):
+    name = request.param
+    if name == "excel" and not pytestconfig.getoption("--mis-xlsx"):
+        pytest.skip("needs --mis-xlsx")
+    if name.startswith("snowflake"):
+        return datasource.SnowflakeBackend(pushdown=name.endswith("pushdown"))
+    return datasource.BACKENDS[name]()
+
+
+@pytest.mark.parametrize("dataset", list(datasource.TABLES))
+def bench_load(benchmark, backend, dataset):
+    benchmark.group = f"load {dataset}"
+    df = benchmark(backend.load, dataset)
+    assert len(df)
+
+
+def bench_load_many(benchmark, backend):
+    benchmark.group = "load_many page 01"
+    frames = benchmark(backend.load_many, PAGE_01)
+    assert all(len(df) for df in frames)
+
+
+def bench_aggregate_azure(benchmark, backend):
+    benchmark.group = "aggregate azure_usage"
+    df = benchmark(backend.aggregate, "azure_usage", AZURE_CUBE, "COST")
+    assert df["COST"].sum() > 0
@@ -0,0 +1,25 @@
+"""
+bench_lost_opportunities.py
+Lost Opportunities: the sales load and the page rerun that computes the
+shortfall for last month, the page's default range.
+"""
+
+import pandas as pd
+import pytest
+
+LAST_MONTH = pd.Timestamp.today().to_period("M") - 1
+DATE_START, DATE_END = LAST_MONTH.start_time, LAST_MONTH.end_time.normalize()
+
+
+@pytest.fixture(scope="module")
+def page(open_page):
+    return open_page("pages/02_Lost_Opportunities.py")
+
+
+def bench_load_data(benchmark, page):
+    df = benchmark(page.load_data.__wrapped__, DATE_START, DATE_END)
+    assert len(df)
+
+
+def bench_page(rerun, page):
+    rerun(page)
@@ -0,0 +1,39 @@
+"""
+bench_projected_revenue.py
+Projected Revenue: the three-dataset load and the okr, ftes and billable_hrs
+rollups, each on the frames the page passes them.
+"""
+
+import pytest
+
+DATE_START = "20240101"  # the page's default starting date
+
+
+@pytest.fixture(scope="module")
+def page(open_page):
+    return open_page("pages/01_Projected_Revenue.py")
+
+
+@pytest.fixture(scope="module")
+def frames(page):
+    return page.load_data(DATE_START)
+
+
+def bench_load_data(benchmark, page):
+    benchmark(page.load_data.__wrapped__, DATE_START)
+
+
+def bench_ftes(benchmark, page, frames):
+    benchmark(page.ftes, frames[0])
+
+
+def bench_billable_hrs(benchmark, page, frames):
+    benchmark(page.billable_hrs, frames[0])
+
+
+def bench_okr(benchmark, page, frames):
+    benchmark(page.okr, frames[2])
+
+
+def bench_page(rerun, page):
+    rerun(page)
@@ -0,0 +1,54 @@
+"""
+bench_sponsorship.py
+MS Sponsorship pages: summing the usage exports from scratch and through the
+manifest, the 2nd page's rollups and in_range, and both page reruns.
+"""
+
+import numpy as np
+import pytest
+
+from usage_csv import aggregate_usage
+
+PAGES = ["pages/04_MS-Sponsorship.py", "pages/04_MS-Sponsorship_2nd.py"]
+KEYS = ["Date", "ServiceName", "ServiceType", "ServiceRegion", "ServiceResource"]
+
+
+@pytest.fixture(scope="module", params=PAGES, ids=["12k", "150k"])
+def page(request, open_page):
+    return open_page(request.param)
+
+
+@pytest.fixture(scope="module")
+def rollups(open_page):
+    page = open_page(PAGES[1])
+    return page, page.load_rollups(page.find_exports())
+
+
+def bench_aggregate_usage(benchmark, page):
+    files = [path for path, _, _ in page.find_exports()]
+    df = benchmark(aggregate_usage, files, KEYS)
+    assert len(df)
+
+
+def bench_load_data2(benchmark, page):
+    exports = page.find_exports()
+    load_data2 = getattr(page.load_data2, "__wrapped__", page.load_data2)
+    load_data2(exports)  # writes the manifest; rounds reuse it
+    benchmark(load_data2, exports)
+
+
+def bench_load_rollups(benchmark, rollups):
+    page, _ = rollups
+    benchmark(page.load_rollups.__wrapped__, page.find_exports())
+
+
+def bench_in_range(benchmark, rollups):
+    page, cached = rollups
+    resource = cached["resource"]
+    low, high = np.percentile(resource["Cost"], [25, 75])
+    df = benchmark(page.in_range, resource, low, high)
+    assert df["Cost"].between(low, high).all()
+
+
+def bench_page(rerun, page):
+    rerun(page)
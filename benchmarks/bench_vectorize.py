@@ -0,0 +1,134 @@
+"""
+bench_vectorize.py
+Row-wise DataFrame.apply versus the columnar expressions that replaced it
+in the page loaders. Each pair is checked for equal output before timing.
+
+    python benchmarks/bench_vectorize.py [rows]
+    python -m pytest benchmarks/bench_vectorize.py     # as part of the suite
+"""
+
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROWS = int(sys.argv[1]) if __name__ == "__main__" and len(sys.argv) > 1 else 300_000
+
+rng = np.random.default_rng(0)
+names = np.array([f"Employee {i}" for i in range(400)])
+
+df_eod = pd.DataFrame(
+    {
+        "EmployeeName": rng.choice(names, ROWS),
+        "Hours": rng.integers(0, 9, ROWS),
+        "Minutes": rng.choice([0, 15, 30, 45], ROWS),
+    }
+)
+df_rates = pd.DataFrame(
+    {
+        "ind_eligibility": rng.choice([0.0, 1.0, np.nan], ROWS),
+        "Target": rng.choice([160.0, 168.0, 176.0], ROWS),
+        "Billed": rng.uniform(100, 180, ROWS),
+        "InitRate": rng.uniform(10, 40, ROWS),
+    }
+)
+df_invoice = pd.DataFrame(
+    {
+        "INV_DATE": pd.Timestamp("2023-01-01")
+        + pd.to_timedelta(rng.integers(0, 700, ROWS), unit="D"),
+    }
+)
+df_emp = pd.DataFrame({"EmployeeName": names})
+interns = names[:50].tolist()
+dd = pd.Series(names[300:])
+
+
+def total_hrs_apply():
+    return df_eod.apply(lambda x: ((x["Hours"] * 60) + x["Minutes"]) / 60, axis=1)
+
+
+def total_hrs_vector():
+    return ((df_eod["Hours"] * 60) + df_eod["Minutes"]) / 60
+
+
+def shortfall_apply():
+    df = df_rates.copy()
+    df["Shortfall"] = df.apply(
+        lambda x: 0 if x["ind_eligibility"] == 1 else x["Target"] - x["Billed"], axis=1
+    )
+    return df.apply(
+        lambda x: 0.0 if x["ind_eligibility"] == 1 else x["Shortfall"] * x["InitRate"],
+        axis=1,
+    )
+
+
+def shortfall_vector():
+    is_eligible = df_rates["ind_eligibility"] == 1
+    shortfall = np.where(is_eligible, 0, df_rates["Target"] - df_rates["Billed"])
+    return pd.Series(np.where(is_eligible, 0.0, shortfall * df_rates["InitRate"]))
+
+
+def inv_yr_apply():
+    return df_invoice.apply(lambda x: x["INV_DATE"].year, axis=1)
+
+
+def inv_yr_vector():
+    return df_invoice["INV_DATE"].astype("datetime64[ns]").dt.year
+
+
+def get_type_apply():
+    def get_type(row):
+        if row.EmployeeName in (interns):
+            return 1
+        elif row.EmployeeName in (dd.to_list()):
+            return 3
+        else:
+            return 2
+
+    return df_emp.apply(lambda x: get_type(x), axis="columns")
+
+
+def get_type_vector():
+    names = df_emp["EmployeeName"]
+    return pd.Series(
+        np.select([names.isin(interns), names.isin(dd)], [1, 3], default=2)
+    )
+
+
+CASES = [
+    ("TotalHrs", total_hrs_apply, total_hrs_vector),
+    ("Shortfall/ShortfallAmt", shortfall_apply, shortfall_vector),
+    ("INV_YR", inv_yr_apply, inv_yr_vector),
+    ("get_type (per employee)", get_type_apply, get_type_vector),
+]
+
+
+@pytest.mark.parametrize("vectorized", [False, True], ids=["apply", "vector"])
+@pytest.mark.parametrize("name, slow, fast", CASES, ids=[case[0] for case in CASES])
+def bench_transform(benchmark, name, slow, fast, vectorized):
+    benchmark.group = f"vectorize {name}"
+    if vectorized:
+        result = benchmark(fast)
+    else:
+        result = benchmark.pedantic(slow, rounds=3)
+    np.testing.assert_allclose(
+        result.to_numpy(dtype=float),
+        (slow if vectorized else fast)().to_numpy(dtype=float),
+    )
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    print(f"{ROWS:,} rows")
+    print(f"{'transform':<26}{'apply (s)':>12}{'vector (s)':>12}{'speedup':>10}")
+    for name, slow, fast in CASES:
+        np.testing.assert_allclose(
+            slow().to_numpy(dtype=float), fast().to_numpy(dtype=float)
+        )
+        t_slow, t_fast = best_of(slow), best_of(fast)
+        print(f"{name:<26}{t_slow:>12.4f}{t_fast:>12.4f}{t_slow / t_fast:>9.0f}x")
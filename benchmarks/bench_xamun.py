@@ -0,0 +1,36 @@
+"""
+bench_xamun.py
+Xamun Resources: the employee and EOD loads, the classification of the EOD
+entries, and the page rerun with its pivots, for the current month.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+DATE_START = date.today().replace(day=1)
+DATE_END = (DATE_START + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+RANGE = (DATE_START.strftime("%Y%m%d"), DATE_END.strftime("%Y%m%d"))
+
+
+@pytest.fixture(scope="module")
+def page(open_page):
+    return open_page("pages/05_Xamun-Resources.py")
+
+
+def bench_load_employees(benchmark, page):
+    benchmark(page.load_employees.__wrapped__)
+
+
+def bench_load_data(benchmark, page):
+    benchmark(page.load_data.__wrapped__)
+
+
+def bench_load_xamun_eod(benchmark, page):
+    page.load_xamun_eod(*RANGE)  # employees and EOD rows cached, as on a rerun
+    df = benchmark(page.load_xamun_eod.__wrapped__, *RANGE)
+    assert len(df)
+
+
+def bench_page(rerun, page):
+    rerun(page)
@@ -0,0 +1,235 @@
+"""
+conftest.py
+pytest-benchmark suite for the pages' data transforms, run headless against
+synthetic data from generate_data.py with Snowflake served by
+testing/fake_snowflake.py.
+
+    python -m pytest benchmarks                        # run, save, compare with the last run
+    python -m pytest benchmarks --mis-scale 10 --mis-latency 0.05
+    python -m pytest benchmarks --benchmark-compare-fail=median:15%
+    python -m pytest benchmarks --benchmark-disable    # run every page once, no timing
+
+Needs pytest and pytest-benchmark on top of requirements.txt. Each run is saved
+under .benchmarks/ (see pytest.ini) and compared with the previous one. The
+data covers the last --mis-months months up to today, so the pages' "current
+month" sections have rows and the volume stays the same from one day to the
+next.
+
+Pages are imported with their Streamlit and plotly calls replaced by stubs
+that render nothing: widgets return their defaults (or a value set by label),
+buttons are never pressed and every toggle is on so each section runs.
+"""
+
+import importlib.util
+import re
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from testing import fake_snowflake
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# page backends by name, as st.secrets.datasource.source
+SOURCES = {"snowflake": 1, "excel": 2, "duckdb": 3}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("mis", "synthetic MIS data")
+    group.addoption("--mis-scale", type=float, default=1.0, help="multiple of 1x volume")
+    group.addoption("--mis-months", type=int, default=24, help="months of data up to today")
+    group.addoption(
+        "--mis-latency", type=float, default=0.0, help="seconds per fake Snowflake query"
+    )
+    group.addoption(
+        "--mis-source",
+        default="snowflake",
+        choices=list(SOURCES),
+        help="backend the pages read from",
+    )
+    group.addoption(
+        "--mis-xlsx",
+        action="store_true",
+        help="also write the workbooks, from 2023 on (slow), and time the excel backend",
+    )
+
+
+def pytest_configure(config):
+    # before anything imports snowflake.snowpark
+    config.mis_database = fake_snowflake.install(
+        latency=config.getoption("--mis-latency", 0.0)
+    )
+
+
+# ----------------------------------------------------
+#       synthetic data
+# ----------------------------------------------------
+
+
+@pytest.fixture(scope="session")
+def mis_data(pytestconfig):
+    import generate_data
+
+    today = pd.Timestamp(date.today())
+    start = today.to_period("M").to_timestamp() - pd.DateOffset(
+        months=pytestconfig.getoption("--mis-months")
+    )
+    if pytestconfig.getoption("--mis-xlsx"):
+        # the excel backend reads the 2023 workbook and the 2024 monthly ones
+        start = min(start, pd.Timestamp(2023, 1, 1))
+    return generate_data.generate(
+        pytestconfig.getoption("--mis-scale"), start, today, seed=0
+    )
+
+
+@pytest.fixture(scope="session")
+def mis_dir(pytestconfig, mis_data, tmp_path_factory):
+    """The data written out, loaded into the fake Snowflake and set as
+    st.secrets."""
+    import generate_data
+    import streamlit as st
+    from streamlit import config
+
+    out = tmp_path_factory.mktemp("mis")
+    tables = generate_data.snowflake_tables(mis_data)
+    if pytestconfig.getoption("--mis-xlsx"):
+        generate_data.write_xlsx(mis_data, out)
+    generate_data.write_csv(mis_data, tables, out)
+    generate_data.write_parquet(tables, out)
+    pytestconfig.mis_database.load_tables(tables)
+
+    secrets = out / "secrets.toml"
+    generate_data.write_secrets(out, SOURCES[pytestconfig.getoption("--mis-source")])
+    with secrets.open("a") as f:
+        f.write(
+            "[connections.snowflake]\n"
+            + "".join(
+                f'{key} = "fake"\n'
+                for key in ("user", "password", "account", "role", "warehouse")
+            )
+            + 'database = "DB_MIS"\nschema = "PUBLIC"\n'
+        )
+
+    previous = config.get_option("secrets.files")
+    config.set_option("secrets.files", [str(secrets)])
+    st.secrets._reset()
+    yield out
+    config.set_option("secrets.files", previous)
+    st.secrets._reset()
+
+
+# ----------------------------------------------------
+#       headless pages
+# ----------------------------------------------------
+
+
+class Stub:
+    """Anything that renders: every attribute and call gives another stub."""
+
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+class Headless(Stub):
+    """streamlit without a front end. Widgets return `values[label]` when
+    given, else their default; toggles are on, buttons never pressed."""
+
+    def __init__(self, values=None):
+        self.values = values or {}
+        self.sidebar = self
+        self.session_state = {}
+
+    @property
+    def secrets(self):
+        import streamlit as st
+
+        return st.secrets
+
+    def _value(self, label, default):
+        return self.values.get(label, default)
+
+    def cache_data(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    cache_resource = cache_data
+
+    def columns(self, spec, **kwargs):
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def tabs(self, labels):
+        return [self] * len(labels)
+
+    def toggle(self, label, value=False, **kwargs):
+        return self._value(label, True)
+
+    def checkbox(self, label, value=False, **kwargs):
+        return self._value(label, value)
+
+    def button(self, label, **kwargs):
+        return self._value(label, False)
+
+    def text_input(self, label, value="", **kwargs):
+        return self._value(label, value)
+
+    def date_input(self, label, value="today", **kwargs):
+        return self._value(label, date.today() if value == "today" else value)
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return self._value(label, min_value if value is None else value)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return self._value(label, options[index] if options else None)
+
+    radio = selectbox
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return self._value(label, [] if default is None else list(default))
+
+
+@pytest.fixture(scope="session")
+def open_page(mis_dir):
+    """Import a page script by path with its rendering stubbed out; `values`
+    sets widgets by label."""
+
+    def open_page(path, values=None):
+        name = "page_" + re.sub(r"\W", "_", Path(path).stem).lower()
+        spec = importlib.util.spec_from_file_location(name, ROOT / path)
+        page = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(page)
+
+        page.st = Headless(values)
+        for charts in ("px", "go"):
+            if hasattr(page, charts):
+                setattr(page, charts, Stub())
+        return page
+
+    return open_page
+
+
+@pytest.fixture
+def rerun(benchmark):
+    """Time page.main() as a rerun: loaders warm, as after a widget change."""
+
+    def rerun(page):
+        page.main()
+        return benchmark(page.main)
+
+    return rerun
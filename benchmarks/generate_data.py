@@ -0,0 +1,551 @@
+"""
+generate_data.py
+Synthetic MIS data at a multiple of production volume, in the layouts the
+loaders read, for load tests and the benchmarks.
+
+    python benchmarks/generate_data.py data/10x --scale 10
+    python benchmarks/generate_data.py data/1x --formats parquet,csv --end 2024-12-31
+
+Writes under OUT (each group only when its format is asked for):
+
+    xlsx     azure/Azure Usage Jan to Dec 2023.xlsx, azure/Azure Usage YYYY-MM.xlsx
+             (two title rows, then Category/Subscription/Cost/UsageDate/
+             Resource Group), billing/Billing v3.0.xlsx (RateCard with its title
+             row, Holidays, employees), billing/BAI Collections as of date.xlsx
+             (Raw), eod/BAI EOD Log Report V2.xlsx
+    csv      sponsorship/12k and sponsorship/150k monthly usage exports,
+             csv/<TABLE>.csv with the Snowflake tables
+    parquet  snapshot/<TABLE>.parquet and the month-partitioned store/
+
+plus secrets.toml with the [azure], [billing], [eod], sponsorship, snapshot and
+store paths pointing at OUT. Volumes scale with --scale; --set name=value
+overrides one of VOLUME (e.g. --set azure_resource_groups=800).
+"""
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from parquet_store import write_dataset
+
+# 1x: roughly the production volume the dashboards were built for
+VOLUME = {
+    "employees": 150,
+    "interns": 20,
+    "clients": 30,
+    "projects": 40,
+    "eod_entries_per_day": 2.0,  # per active person
+    "azure_resource_groups": 120,
+    "azure_resources_per_group": 2.0,
+    "azure_categories": 15,
+    "sponsorship_services": 40,
+    "sponsorship_resources_per_service": 6.0,
+    "holidays_per_year": 18,
+}
+
+# per-entity densities and calendars do not grow with the scale factor
+FIXED = {
+    "eod_entries_per_day",
+    "azure_resources_per_group",
+    "azure_categories",
+    "sponsorship_resources_per_service",
+    "holidays_per_year",
+}
+
+XAMUN_PROJS = [
+    "Xamun",
+    "Xamun Delivery",
+    "Advance Energy",
+    "Xamun Marketplace",
+    "Xamun Solutions",
+    "Steer Marketplace",
+    "ePCSO",
+    "AE Project 2 WebUI",
+    "BPS",
+]
+EXCLUDED_PROJECTS = ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
+XAMUN_ACCOUNTS = ["Xamun Core", "Xamun Solutions", "Xamun Delivery"]
+RANKS = ["Junior", "Mid", "Senior", "Lead"]
+DEPARTMENTS = ["Engineering", "QA", "Design", "PMO", "Analytics", "Admin"]
+REGIONS = ["southeastasia", "eastasia", "eastus", "westeurope", "global"]
+SERVICE_TYPES = ["Compute", "Storage", "Networking", "Databases", "AI + ML"]
+
+
+def volume(scale=1.0, **overrides):
+    counts = {
+        name: value if name in FIXED else value * scale
+        for name, value in VOLUME.items()
+    }
+    counts.update(overrides)
+    return {
+        name: value if isinstance(VOLUME[name], float) else max(1, int(round(value)))
+        for name, value in counts.items()
+    }
+
+
+def month_starts(start, end):
+    return pd.date_range(pd.Timestamp(start).replace(day=1), end, freq="MS")
+
+
+# ----------------------------------------------------
+#       source layouts (as the workbooks have them)
+# ----------------------------------------------------
+
+
+def make_employees(rng, counts, start):
+    n = counts["employees"]
+    xamun = rng.random(n) < 0.4
+    resigned = rng.random(n) < 0.15
+    hired = pd.Timestamp(start) - pd.to_timedelta(rng.integers(0, 2000, n), unit="D")
+    projects = make_projects(counts)
+
+    df = pd.DataFrame(
+        {
+            "Employee": [f"Employee {i:05d}" for i in range(n)],
+            "GRP": np.where(
+                xamun, rng.choice(["X1", "X2"], n), rng.choice(["DD", "QRI", "ADM"], n)
+            ),
+            "Resigned": np.where(resigned, "X", None),
+            "LastDay": pd.Series(
+                hired + pd.to_timedelta(rng.integers(200, 1500, n), unit="D")
+            ).where(resigned),
+            "Rank": rng.choice(RANKS, n),
+            "Level": rng.integers(1, 4, n),
+            "Start": hired,
+            "Account": np.where(
+                xamun, rng.choice(XAMUN_ACCOUNTS, n), rng.choice(projects, n)
+            ),
+            "GRP2": rng.choice(DEPARTMENTS, n),
+            "Company": np.where(xamun, "Xamun", "BAI"),
+            "Include": (rng.random(n) < 0.9).astype(int),
+            "Remarks": rng.choice(["Full Stack", "Tester", "PM", "Designer", None], n),
+        }
+    )
+    delivery = df["Account"] == "Xamun Delivery"
+    df["XamunBilledProj"] = pd.Series(rng.choice(XAMUN_PROJS, n)).where(
+        delivery & (rng.random(n) < 0.5)
+    )
+    df["XamunActivities"] = pd.Series(
+        rng.choice(["Support", "Development", "Sales"], n)
+    ).where(delivery)
+    # placeholder rows the loaders filter out
+    df.loc[rng.random(n) < 0.02, "Company"] = "DUMMY"
+    return df
+
+
+def make_projects(counts):
+    n = max(counts["projects"], len(XAMUN_PROJS))
+    return XAMUN_PROJS + [f"Project {i:03d}" for i in range(n - len(XAMUN_PROJS))]
+
+
+def make_rate_card(rng, counts, employees, start, end):
+    months = month_starts(start, end)
+    projects = make_projects(counts) + EXCLUDED_PROJECTS
+    emp = employees.loc[employees["Company"] != "DUMMY"]
+
+    rows = len(emp) * len(months)
+    target = rng.choice([160.0, 168.0, 176.0], rows)
+    init_rate = rng.uniform(8, 45, rows).round(2)
+    fte = rng.choice([1.0, 1.0, 1.0, 0.5], rows)
+    project = pd.Series(rng.choice(projects, rows)).where(rng.random(rows) > 0.05)
+
+    return pd.DataFrame(
+        {
+            "Employee": np.tile(emp["Employee"].to_numpy(), len(months)),
+            "Project": project,
+            "InitRate": init_rate,
+            "FTE": fte,
+            "Rate": (init_rate * fte).round(2),
+            "Period": np.repeat(months.to_numpy(), len(emp)),
+            "Rank": np.tile(emp["Rank"].to_numpy(), len(months)),
+            "Level": np.tile(emp["Level"].to_numpy(), len(months)),
+            "Target2": target,
+            "Billed": pd.Series(
+                (target - rng.exponential(12, rows)).clip(0).round(1)
+            ).where(rng.random(rows) > 0.03),
+            "ind_eligibility": pd.Series(rng.choice([0.0, 1.0], rows, p=[0.8, 0.2])).where(
+                rng.random(rows) > 0.1
+            ),
+        }
+    )
+
+
+def make_holidays(rng, counts, start, end):
+    frames = []
+    for year in range(pd.Timestamp(start).year, pd.Timestamp(end).year + 1):
+        days = pd.bdate_range(f"{year}-01-01", f"{year}-12-31")
+        picked = np.sort(rng.choice(days, counts["holidays_per_year"], replace=False))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Date": picked,
+                    "Holiday": [f"Holiday {year}-{i:02d}" for i in range(len(picked))],
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_invoices(rng, counts, start, end):
+    months = month_starts(start, end)
+    n_clients = max(3, counts["clients"])
+    clients = np.array([f"Client {i:03d}" for i in range(n_clients)])
+    # every engagement type every month, which the collections table expects
+    tx_type = np.array(["d", "x", "f"])[np.arange(n_clients) % 3]
+
+    rows = n_clients * len(months)
+    inv_date = pd.DatetimeIndex(np.repeat(months.to_numpy(), n_clients)) + pd.to_timedelta(
+        rng.integers(0, 28, rows), unit="D"
+    )
+    tx = np.tile(tx_type, len(months))
+    amount = np.where(
+        tx == "d", rng.uniform(2_000, 40_000, rows), rng.uniform(100_000, 2_000_000, rows)
+    ).round(2)
+    date_paid = pd.Series(
+        inv_date + pd.to_timedelta(rng.integers(10, 75, rows), unit="D")
+    )
+    date_paid = date_paid.where((rng.random(rows) < 0.85) & (date_paid <= pd.Timestamp(end)))
+
+    return pd.DataFrame(
+        {
+            "CLIENT": np.tile(clients, len(months)),
+            "INV_DATE": inv_date,
+            "DUE_DATE": inv_date + pd.Timedelta(days=30),
+            "INV_AMOUNT": amount,
+            "CURRENCY": np.where(tx == "d", "USD", "PHP"),
+            "DATE_PAID": date_paid,
+            "PAYMENT_AMOUNT": pd.Series(amount).where(date_paid.notna()),
+            "TX_TYPE": tx,
+            "INV_MON": inv_date.month,
+            "PAYMENT_MON": date_paid.dt.month.astype("Int64"),
+        }
+    )
+
+
+def make_eod(rng, counts, employees, start, end):
+    people = np.concatenate(
+        [
+            employees.loc[employees["Company"] != "DUMMY", "Employee"].to_numpy(),
+            # interns log hours without being on the employee sheet
+            [f"Intern {i:04d}" for i in range(counts["interns"])],
+        ]
+    )
+    days = pd.bdate_range(start, end)
+    per_day = max(1, int(round(len(people) * counts["eod_entries_per_day"])))
+    rows = per_day * len(days)
+    accounts = XAMUN_PROJS + ["Data Analytics", "SwiftLoan"] + make_projects(counts)[
+        len(XAMUN_PROJS) :
+    ]
+
+    return pd.DataFrame(
+        {
+            "EmployeeName": rng.choice(people, rows),
+            "Date": np.repeat(days.to_numpy(), per_day),
+            "Account": rng.choice(accounts, rows),
+            "Task": rng.choice(["Development", "Meeting", "Testing", "Support"], rows),
+            "Hours": rng.integers(0, 9, rows),
+            "Minutes": rng.choice([0, 15, 30, 45], rows),
+        }
+    )
+
+
+def make_azure(rng, counts, start, end):
+    n_groups = counts["azure_resource_groups"]
+    per_group = rng.poisson(counts["azure_resources_per_group"] - 1, n_groups) + 1
+    n_resources = per_group.sum()
+    categories = [f"Category {i:02d}" for i in range(counts["azure_categories"])]
+
+    # each resource keeps its group, subscription and category every day
+    group = np.repeat(np.arange(n_groups), per_group)
+    subscription = np.where(rng.random(n_groups) < 0.6, "QR Core Production", "QR Core POC")
+    resource = pd.DataFrame(
+        {
+            "Category": rng.choice(categories, n_resources),
+            "Subscription": subscription[group],
+            "Resource Group": np.array([f"rg-{i:04d}" for i in range(n_groups)])[group],
+            "Resource": [f"res-{i:05d}" for i in range(n_resources)],
+            "base": rng.lognormal(0.0, 1.2, n_resources),
+        }
+    )
+
+    days = pd.date_range(start, end, freq="D")
+    df = resource.iloc[np.tile(np.arange(n_resources), len(days))].reset_index(drop=True)
+    df["UsageDate"] = np.repeat(days.to_numpy(), n_resources)
+    df["Cost"] = (df.pop("base") * rng.uniform(0.5, 1.5, len(df))).round(4)
+    return df[["Category", "Subscription", "Cost", "UsageDate", "Resource Group", "Resource"]]
+
+
+def make_sponsorship(rng, counts, start, end, size=1.0):
+    n_services = max(1, int(counts["sponsorship_services"] * size))
+    per_service = (
+        rng.poisson(counts["sponsorship_resources_per_service"] - 1, n_services) + 1
+    )
+    service = np.repeat(np.arange(n_services), per_service)
+    n_resources = len(service)
+    resource = pd.DataFrame(
+        {
+            "SubscriptionName": "Microsoft Azure Sponsorship",
+            "ServiceName": np.array([f"Service {i:03d}" for i in range(n_services)])[service],
+            "ServiceType": rng.choice(SERVICE_TYPES, n_services)[service],
+            "ServiceRegion": rng.choice(REGIONS, n_resources),
+            "ServiceResource": [f"resource-{i:05d}" for i in range(n_resources)],
+            "base": rng.lognormal(-1.0, 1.5, n_resources),
+        }
+    )
+
+    days = pd.date_range(start, end, freq="D")
+    df = resource.iloc[np.tile(np.arange(n_resources), len(days))].reset_index(drop=True)
+    df.insert(0, "Date", np.repeat(days.to_numpy(), n_resources))
+    df["Quantity"] = rng.uniform(0, 24, len(df)).round(3)
+    df["Cost"] = (df.pop("base") * rng.uniform(0.2, 1.8, len(df))).round(6)
+    return df
+
+
+def generate(scale=1.0, start="2023-01-01", end=None, seed=0, **overrides):
+    """Every source frame, in the layout of its workbook or export."""
+    end = pd.Timestamp(end or date.today())
+    rng = np.random.default_rng(seed)
+    counts = volume(scale, **overrides)
+
+    employees = make_employees(rng, counts, start)
+    return {
+        "azure": make_azure(rng, counts, start, end),
+        "rate_card": make_rate_card(rng, counts, employees, start, end),
+        "holidays": make_holidays(rng, counts, start, end),
+        "employees": employees,
+        "invoices": make_invoices(rng, counts, start, end),
+        "eod": make_eod(rng, counts, employees, start, end),
+        "sponsorship_12k": make_sponsorship(rng, counts, start, end, size=0.5),
+        "sponsorship_150k": make_sponsorship(rng, counts, start, end),
+    }
+
+
+# ----------------------------------------------------
+#       Snowflake tables
+# ----------------------------------------------------
+
+
+def snowflake_tables(data):
+    """The sources as the upload pipeline leaves them in Snowflake."""
+    azure = data["azure"]
+    production = azure["Subscription"] == "QR Core Production"
+    # the same relabelling the Azure page applies to the workbooks
+    subscription = np.where(
+        azure["UsageDate"].dt.year == 2023,
+        np.where(production, "Production", "Beta"),
+        np.where(production, "Beta", "Production"),
+    )
+    invoices = data["invoices"]
+
+    return {
+        "AZURECONSUMPTION": pd.DataFrame(
+            {
+                "USAGEDATE": azure["UsageDate"],
+                "SUBSCRIPTION": subscription,
+                "CATEGORY": azure["Category"],
+                "RESOURCEGROUP": azure["Resource Group"],
+                "COST": azure["Cost"],
+            }
+        ),
+        "SALES": data["rate_card"].rename(
+            columns={
+                "Employee": "EMPLOYEE",
+                "Project": "PROJECT",
+                "InitRate": "INIT_RATE",
+                "Rate": "RATE",
+                "Period": "PERIOD",
+                "Rank": "RANK",
+                "Level": "LEVEL",
+                "Target2": "TARGET",
+                "Billed": "BILLED",
+                "ind_eligibility": "INDIV_ELIGIBILITY",
+            }
+        ),
+        "HOLIDAY": data["holidays"].rename(
+            columns={"Date": "HOLIDAY", "Holiday": "HOLIDAY_NAME"}
+        ),
+        "INVOICE": invoices.assign(
+            INV_YR=invoices["INV_DATE"].dt.year,
+            PAYMENT_YR=invoices["DATE_PAID"].dt.year.astype("Int64"),
+        ),
+        "EMPLOYEE": data["employees"]
+        .rename(
+            columns={
+                "Employee": "EMPLOYEE",
+                "Resigned": "RESIGNED",
+                "LastDay": "LASTDAY",
+                "Rank": "RANK",
+                "Level": "LEVEL",
+                "Start": "START_DATE",
+                "Account": "ACCOUNT",
+                "Company": "COMPANY",
+                "Include": "INCLUDE",
+            }
+        )
+        .assign(RESIGNED=lambda df: df["RESIGNED"] == "X"),
+        "EOD": data["eod"]
+        .drop(columns=["Task"])
+        .rename(
+            columns={
+                "EmployeeName": "EMPLOYEE",
+                "Date": "DATE",
+                "Account": "ACCOUNT",
+                "Hours": "HOURS",
+                "Minutes": "MINUTES",
+            }
+        ),
+    }
+
+
+# table -> (dataset, partitioning date) of datasource.py
+DATASETS = {
+    "AZURECONSUMPTION": ("azure_usage", "USAGEDATE"),
+    "SALES": ("sales", "PERIOD"),
+    "HOLIDAY": ("holidays", None),
+    "INVOICE": ("invoices", "INV_DATE"),
+    "EMPLOYEE": ("employees", None),
+    "EOD": ("eod", "DATE"),
+}
+
+
+# ----------------------------------------------------
+#       writers
+# ----------------------------------------------------
+
+
+def write_sheets(file, sheets):
+    """`{sheet: (frame, title rows)}` to one workbook, streamed row by row."""
+    workbook = Workbook(write_only=True)
+    for name, (df, titles) in sheets.items():
+        sheet = workbook.create_sheet(name)
+        for title in titles:
+            sheet.append([title])
+        sheet.append(list(df.columns))
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False):
+            sheet.append(row)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(file)
+
+
+def write_xlsx(data, out):
+    azure = data["azure"]
+    year = azure["UsageDate"].dt.year
+    titles = ["Azure Usage", "Generated by benchmarks/generate_data.py"]
+    if (year == 2023).any():
+        write_sheets(
+            out / "azure" / "Azure Usage Jan to Dec 2023.xlsx",
+            {"Sheet1": (azure.loc[year == 2023], titles)},
+        )
+    later = azure.loc[year > 2023]
+    for month, df in later.groupby(later["UsageDate"].dt.strftime("%Y-%m")):
+        write_sheets(out / "azure" / f"Azure Usage {month}.xlsx", {"Sheet1": (df, titles)})
+
+    write_sheets(
+        out / "billing" / "Billing v3.0.xlsx",
+        {
+            "RateCard": (data["rate_card"], ["Rate Card"]),
+            "Holidays": (data["holidays"], []),
+            "employees": (data["employees"], []),
+        },
+    )
+    write_sheets(
+        out / "billing" / "BAI Collections as of date.xlsx",
+        {"Raw": (data["invoices"], [])},
+    )
+    write_sheets(
+        out / "eod" / "BAI EOD Log Report V2.xlsx", {"Sheet1": (data["eod"], [])}
+    )
+
+
+def write_csv(data, tables, out):
+    for name in ["12k", "150k"]:
+        df = data[f"sponsorship_{name}"]
+        directory = out / "sponsorship" / name
+        directory.mkdir(parents=True, exist_ok=True)
+        for month, part in df.groupby(df["Date"].dt.strftime("%Y_%m")):
+            part.to_csv(directory / f"usage_{month}.csv", index=False, date_format="%Y-%m-%d")
+
+    (out / "csv").mkdir(parents=True, exist_ok=True)
+    for table, df in tables.items():
+        df.to_csv(out / "csv" / f"{table}.csv", index=False)
+
+
+def write_parquet(tables, out):
+    (out / "snapshot").mkdir(parents=True, exist_ok=True)
+    for table, df in tables.items():
+        # as snapshot.load_incremental stores them: Snowflake DATEs as dates
+        dates = df.select_dtypes("datetime").columns
+        snapshot = df.assign(**{column: df[column].dt.date for column in dates})
+        snapshot.to_parquet(out / "snapshot" / f"{table}.parquet", index=False)
+        write_dataset(df, out / "store" / table, DATASETS[table][1])
+
+
+def write_secrets(out, source=2):
+    out = out.resolve()
+    paths = {
+        "azure": out / "azure",
+        "billing": out / "billing",
+        "eod": out / "eod",
+        "sponsorshipnoel": out / "sponsorship" / "12k",
+        "sponsorshippam": out / "sponsorship" / "150k",
+        "snapshot": out / "snapshot",
+        "store": out / "store",
+    }
+    lines = ["[datasource]", f"source = {source}", ""]
+    for section, path in paths.items():
+        lines += [f"[{section}]", f'path = "{path.as_posix()}"', ""]
+    (out / "secrets.toml").write_text("\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic MIS datasets.")
+    parser.add_argument("out", type=Path, help="directory to write to")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiple of 1x volume")
+    parser.add_argument("--start", default="2023-01-01")
+    parser.add_argument("--end", default=None, help="last day (default: today)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--formats", default="xlsx,csv,parquet", help="comma-separated xlsx,csv,parquet"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help=f"override a volume: {', '.join(VOLUME)}",
+    )
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        if name not in VOLUME:
+            parser.error(f"unknown volume: {name}")
+        overrides[name] = float(value)
+    formats = set(args.formats.split(","))
+
+    data = generate(args.scale, args.start, args.end, args.seed, **overrides)
+    tables = snowflake_tables(data)
+    args.out.mkdir(parents=True, exist_ok=True)
+    if "xlsx" in formats:
+        write_xlsx(data, args.out)
+    if "csv" in formats:
+        write_csv(data, tables, args.out)
+    if "parquet" in formats:
+        write_parquet(tables, args.out)
+    write_secrets(args.out)
+
+    for name, df in {**data, **tables}.items():
+        print(f"{name:>18}: {len(df):>10,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+billing.py
+Billing v3.0.xlsx, opened once for every sheet the app reads from it.
+
+    sheets = load_billing()
+    df_rates = sheets["RateCard"][cols]
+
+The sheets are read in full (callers pick their columns), so the pages and
+upload_data.py share the same Parquet sidecars, and a change to the workbook
+costs one parse instead of one per sheet per page.
+"""
+
+from pathlib import Path
+
+import streamlit as st
+
+from excel_cache import read_workbook
+
+BILLING_WORKBOOK = "Billing v3.0.xlsx"
+
+SHEETS = {
+    "RateCard": {"skiprows": 1},
+    "Holidays": {},
+    "employees": {},
+}
+
+
+def billing_file():
+    return Path(st.secrets.billing.path) / BILLING_WORKBOOK
+
+
+def read_billing(file):
+    """`{sheet: frame}` for SHEETS of the workbook at `file`."""
+    return read_workbook(file, SHEETS)
+
+
+@st.cache_resource
+def _load(file, mtime):
+    return read_billing(file)
+
+
+def load_billing():
+    """`read_billing` of the configured workbook, kept until its mtime changes."""
+    file = billing_file()
+    return _load(str(file), file.stat().st_mtime_ns)
@@ -0,0 +1,23 @@
+"""
+cli.py
+Argument checks shared by the command-line scripts (upload_data.py,
+parquet_store.py).
+"""
+
+import argparse
+
+
+def one_of(choices, normalize=None):
+    """argparse `type` taking a value of `choices` (after `normalize`). For
+    nargs="*" arguments, where `choices=` would also reject the empty list."""
+    choices = list(choices)
+
+    def check(value):
+        value = normalize(value) if normalize else value
+        if value not in choices:
+            raise argparse.ArgumentTypeError(
+                f"unknown {value!r} (choose from {', '.join(choices)})"
+            )
+        return value
+
+    return check
@@ -0,0 +1,602 @@
+"""
+datasource.py
+The datasets the pages read, behind one interface whatever the backend.
+
+    source = get_backend()
+    df = source.load("sales", ["PROJECT", "PERIOD"], where=[("PERIOD", ">=", start)])
+    cube = source.aggregate("azure_usage", CUBE_DIMS, "COST")
+
+Datasets: azure_usage, sales, holidays, invoices, eod, employees. Every
+backend returns the column names of the Snowflake tables, so the pages rename
+once whatever the source. Backends:
+
+    snowflake  the warehouse through the session pool; filters, aggregates
+               and the queries of one page (`load_many`, as async jobs) run
+               there
+    excel      the source workbooks, read through their Parquet sidecars and
+               kept in memory until a workbook changes
+    parquet    snapshot files <snapshot path>/<TABLE>.parquet, written by
+               `refresh` from Snowflake (on the first load when missing)
+    duckdb     SQL over the month-partitioned store of parquet_store.py;
+               filters on the partitioning date skip whole months
+
+st.secrets.datasource.backend picks one; without it source 1 is snowflake,
+2 excel and 3 duckdb.
+
+`where` is a list of (column, op, value), all of which must hold. ops are
+==, <, <=, >, >=, in, not in (nulls never match these, as in SQL), not null,
+and "is distinct from" (keeps nulls). Dates are compared as datetime.date.
+"""
+
+import operator
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import streamlit as st
+from snowflake.snowpark.functions import col, lit
+from snowflake.snowpark.functions import sum as sum_
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from billing import billing_file, load_billing
+from excel_cache import read_excel_cached, read_excel_many
+from parquet_store import MONTH, stored_months, write_dataset
+from snapshot import load_incremental
+from snowflake_session import pooled_session
+
+# loaders hand out shared frames (st.cache_resource); with Copy-on-Write,
+# frames derived from them by the pages never write through to the cache
+pd.set_option("mode.copy_on_write", True)
+
+TABLES = {
+    "azure_usage": "AZURECONSUMPTION",
+    "sales": "DB_MIS.PUBLIC.SALES",
+    "holidays": "DB_MIS.PUBLIC.HOLIDAY",
+    "invoices": "DB_MIS.PUBLIC.INVOICE",
+    "eod": "DB_MIS.PUBLIC.EOD",
+    "employees": "DB_MIS.PUBLIC.EMPLOYEE",
+}
+
+# date columns, returned as datetime64 by every backend
+DATE_COLUMNS = {
+    "azure_usage": ["USAGEDATE"],
+    "sales": ["PERIOD"],
+    "holidays": ["HOLIDAY"],
+    "invoices": ["INV_DATE", "DUE_DATE", "DATE_PAID"],
+    "eod": ["DATE"],
+}
+
+# append-only tables: snapshots are topped up from their newest date
+INCREMENTAL = {"azure_usage": "USAGEDATE", "eod": "DATE"}
+
+# the Parquet store splits these datasets into one directory per month
+PARTITION_BY = {
+    "azure_usage": "USAGEDATE",
+    "eod": "DATE",
+    "sales": "PERIOD",
+    "invoices": "INV_DATE",
+}
+
+COMPARISONS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def snapshot_path():
+    return Path(st.secrets.get("snapshot", {}).get("path", "snapshot"))
+
+
+def store_path():
+    return Path(st.secrets.get("store", {}).get("path", "store"))
+
+
+def snapshot_file(name, path=None):
+    return Path(path or snapshot_path()) / f"{TABLES[name].split('.')[-1]}.parquet"
+
+
+def _as_dates(name, df):
+    dates = {c: "datetime64[ns]" for c in DATE_COLUMNS.get(name, []) if c in df}
+    return df.astype(dates) if dates else df
+
+
+def _timestamp(value):
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return pd.Timestamp(value)
+    return value
+
+
+def _mask(df, where):
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in where:
+        values = df[column]
+        if op in ("in", "not in"):
+            value = [_timestamp(v) for v in value]
+        else:
+            value = _timestamp(value)
+        if op == "in":
+            mask &= values.isin(value)
+        elif op == "not in":
+            mask &= values.notna() & ~values.isin(value)
+        elif op == "not null":
+            mask &= values.notna()
+        elif op == "is distinct from":
+            mask &= values.isna() | (values != value)
+        else:
+            mask &= values.notna() & COMPARISONS[op](values, value)
+    return mask
+
+
+def filter_frame(df, columns=None, where=()):
+    """`where` and `columns` applied to a frame already in memory."""
+    if where:
+        df = df.loc[_mask(df, where)]
+    return df if columns is None else df[list(columns)]
+
+
+def sum_frame(df, by, value):
+    return (
+        df.astype({value: "float64"})
+        .groupby(list(by), as_index=False, dropna=False)[value]
+        .sum()
+    )
+
+
+class Backend(ABC):
+    @abstractmethod
+    def load(self, name, columns=None, where=()):
+        """`columns` (default all) of the rows of `name` matching `where`."""
+
+    def aggregate(self, name, by, value, where=()):
+        """`value` summed over `by`, sorted by `by`."""
+        return sum_frame(self.load(name, list(by) + [value], where), by, value)
+
+    def load_many(self, requests):
+        """`load` of each (name, columns, where), run side by side on threads
+        that see the calling script's context (the loaders use st.secrets and
+        st.cache_resource)."""
+        requests = list(requests)
+        if len(requests) <= 1:
+            return [self.load(*request) for request in requests]
+        with ThreadPoolExecutor(
+            max_workers=len(requests),
+            initializer=add_script_run_ctx,
+            initargs=(None, get_script_run_ctx()),
+        ) as pool:
+            return list(pool.map(lambda request: self.load(*request), requests))
+
+    def refresh(self, name, full=False):
+        """Bring any local copy of `name` up to date."""
+
+
+# ----------------------------------------------------
+#       Snowflake
+# ----------------------------------------------------
+
+
+def _snowpark_condition(where):
+    condition = None
+    for column, op, value in where:
+        c = col(column)
+        if op == "in":
+            term = c.isin(value)
+        elif op == "not in":
+            term = ~c.isin(value)
+        elif op == "not null":
+            term = c.is_not_null()
+        elif op == "is distinct from":
+            term = ~c.equal_null(lit(value))
+        else:
+            term = COMPARISONS[op](c, value)
+        condition = term if condition is None else condition & term
+    return condition
+
+
+class SnowflakeBackend(Backend):
+    def __init__(self, pushdown=False):
+        # without pushdown azure_usage is served from the local snapshot
+        self.pushdown = pushdown
+        # name -> snapshot just topped up by `refresh`, for the next load
+        self._refreshed = {}
+
+    def _query(self, session, name, columns=None, where=()):
+        table = session.table(TABLES[name])
+        if where:
+            table = table.filter(_snowpark_condition(where))
+        return table if columns is None else table.select(*columns)
+
+    def _snapshot(self, name, full=False):
+        with pooled_session() as session:
+            return load_incremental(
+                session, TABLES[name], INCREMENTAL[name], snapshot_file(name), full=full
+            )
+
+    def load(self, name, columns=None, where=()):
+        if name == "azure_usage" and not self.pushdown:
+            # after a refresh, its frame; no second round trip for the new rows
+            df = self._refreshed.pop(name, None)
+            if df is None:
+                df = self._snapshot(name)
+            return filter_frame(_as_dates(name, df), columns, where)
+        return self.load_many([(name, columns, where)])[0]
+
+    def load_many(self, requests):
+        if not self.pushdown and any(name == "azure_usage" for name, _, _ in requests):
+            return super().load_many(requests)
+
+        with pooled_session() as session:
+            # submit every query before waiting on any of them
+            jobs = [
+                self._query(session, *request).to_pandas(block=False)
+                for request in requests
+            ]
+            frames = [job.result() for job in jobs]
+        return [_as_dates(request[0], df) for request, df in zip(requests, frames)]
+
+    def aggregate(self, name, by, value, where=()):
+        if name == "azure_usage" and not self.pushdown:
+            return super().aggregate(name, by, value, where)
+
+        with pooled_session() as session:
+            df = (
+                self._query(session, name, where=where)
+                .group_by(*by)
+                .agg(sum_(value).alias(value))
+                .sort(*by)
+                .to_pandas()
+            )
+        return _as_dates(name, df)
+
+    def refresh(self, name, full=False):
+        if name == "azure_usage" and not self.pushdown:
+            self._refreshed[name] = self._snapshot(name, full=full)
+
+
+# ----------------------------------------------------
+#       Excel
+# ----------------------------------------------------
+
+
+def _azure_workbooks():
+    path = Path(st.secrets.azure.path)
+    return sorted(path.glob("Azure Usage 2024-*.xlsx")) + [
+        path / "Azure Usage Jan to Dec 2023.xlsx"
+    ]
+
+
+def _invoices_workbook():
+    return Path(st.secrets.billing.path) / "BAI Collections as of date.xlsx"
+
+
+def _eod_workbook():
+    return Path(st.secrets.eod.path) / "BAI EOD Log Report V2.xlsx"
+
+
+def _excel_azure_usage():
+    def load_monthly(_df):
+        # change 'QR Core Production'==>'Beta'; and 'QR Core POC'==>'Production'
+        beta = _df.Subscription == "QR Core Production"
+        return _df.assign(Subscription=beta.map({True: "Beta", False: "Production"}))
+
+    # parse the workbooks in worker processes; results keep the order of the files
+    *arr_df, df_since_2023 = read_excel_many(
+        _azure_workbooks(),
+        max_workers=st.secrets.azure.get("workers"),
+        skiprows=2,
+        usecols=["Category", "Subscription", "Cost", "UsageDate", "Resource Group"],
+        engine="openpyxl",
+        dtype={"Cost": "float16"},
+    )
+    arr_df = [load_monthly(el) for el in arr_df]
+
+    # change 'QR Core Production'==>'Production'; and 'QR Core POC'==>'Beta'
+    production = df_since_2023.Subscription == "QR Core Production"
+    arr_df.append(
+        df_since_2023.assign(
+            Subscription=production.map({True: "Production", False: "Beta"})
+        )
+    )
+
+    return pd.concat(arr_df, ignore_index=True).rename(
+        columns={
+            "Category": "CATEGORY",
+            "Subscription": "SUBSCRIPTION",
+            "Cost": "COST",
+            "UsageDate": "USAGEDATE",
+            "Resource Group": "RESOURCEGROUP",
+        }
+    )
+
+
+def _excel_sales():
+    cols = [
+        "Employee",
+        "Project",
+        "InitRate",
+        "FTE",
+        "Rate",
+        "Period",
+        "Rank",
+        "Level",
+        "Target2",
+        "Billed",
+        "ind_eligibility",
+    ]
+    return load_billing()["RateCard"][cols].rename(
+        columns={
+            "InitRate": "INIT_RATE",
+            "Target2": "TARGET",
+            "ind_eligibility": "INDIV_ELIGIBILITY",
+            "Employee": "EMPLOYEE",
+            "Project": "PROJECT",
+            "Rate": "RATE",
+            "Period": "PERIOD",
+            "Rank": "RANK",
+            "Level": "LEVEL",
+            "Billed": "BILLED",
+        }
+    )
+
+
+def _excel_holidays():
+    df = load_billing()["Holidays"]
+    return pd.DataFrame({"HOLIDAY": df["Date"], "HOLIDAY_NAME": df["Holiday"]})
+
+
+def _excel_invoices():
+    df = read_excel_cached(_invoices_workbook(), sheet_name="Raw").drop(columns=["CURRENCY"])
+    return df.assign(
+        INV_YR=df["INV_DATE"].astype("datetime64[ns]").dt.year,
+        PAYMENT_YR=df["DATE_PAID"].astype("datetime64[ns]").dt.year,
+    )
+
+
+def _excel_eod():
+    df = read_excel_cached(
+        _eod_workbook(),
+        usecols=["EmployeeName", "Date", "Account", "Hours", "Minutes"],
+        dtype={"Date": "datetime64[ns]"},
+        engine="openpyxl",
+    )
+    return df.rename(
+        columns={
+            "EmployeeName": "EMPLOYEE",
+            "Date": "DATE",
+            "Account": "ACCOUNT",
+            "Hours": "HOURS",
+            "Minutes": "MINUTES",
+        }
+    )
+
+
+def _excel_employees():
+    df = load_billing()["employees"].rename(
+        columns={
+            "Employee": "EMPLOYEE",
+            "Resigned": "RESIGNED",
+            "LastDay": "LASTDAY",
+            "Rank": "RANK",
+            "Level": "LEVEL",
+            "Start": "START_DATE",
+            "Account": "ACCOUNT",
+            "Company": "COMPANY",
+            "Include": "INCLUDE",
+        }
+    )
+    # convert "X" to boolean True and blank to False
+    return df.assign(RESIGNED=df["RESIGNED"] == "X")
+
+
+EXCEL_READERS = {
+    "azure_usage": _excel_azure_usage,
+    "sales": _excel_sales,
+    "holidays": _excel_holidays,
+    "invoices": _excel_invoices,
+    "eod": _excel_eod,
+    "employees": _excel_employees,
+}
+
+
+# the workbooks each dataset is read from
+EXCEL_WORKBOOKS = {
+    "azure_usage": _azure_workbooks,
+    "sales": lambda: [billing_file()],
+    "holidays": lambda: [billing_file()],
+    "invoices": lambda: [_invoices_workbook()],
+    "eod": lambda: [_eod_workbook()],
+    "employees": lambda: [billing_file()],
+}
+
+
+class ExcelBackend(Backend):
+    def __init__(self):
+        # name -> (mtimes of its workbooks, frame); the sidecars are keyed by
+        # the same mtimes, so a frame is read again only when they are rewritten
+        self._frames = {}
+
+    def _frame(self, name):
+        mtimes = tuple(
+            (str(file), file.stat().st_mtime_ns) for file in EXCEL_WORKBOOKS[name]()
+        )
+        cached = self._frames.get(name)
+        if cached is None or cached[0] != mtimes:
+            cached = self._frames[name] = (mtimes, _as_dates(name, EXCEL_READERS[name]()))
+        return cached[1]
+
+    def load(self, name, columns=None, where=()):
+        # a shallow copy, so the caller can't add columns to the kept frame
+        return filter_frame(self._frame(name).copy(deep=False), columns, where)
+
+
+# ----------------------------------------------------
+#       Parquet snapshot
+# ----------------------------------------------------
+
+
+class ParquetBackend(Backend):
+    def __init__(self, path=None):
+        self.path = Path(path or snapshot_path())
+
+    def load(self, name, columns=None, where=()):
+        file = snapshot_file(name, self.path)
+        if not file.exists():
+            self.refresh(name)
+        needed = None
+        if columns is not None:
+            needed = list(dict.fromkeys(list(columns) + [c for c, _, _ in where]))
+        df = _as_dates(name, pd.read_parquet(file, columns=needed))
+        return filter_frame(df, columns, where)
+
+    def refresh(self, name, full=False):
+        with pooled_session() as session:
+            load_incremental(
+                session,
+                TABLES[name],
+                INCREMENTAL.get(name),
+                snapshot_file(name, self.path),
+                full=full or name not in INCREMENTAL,
+            )
+
+
+# ----------------------------------------------------
+#       DuckDB over the Parquet store
+# ----------------------------------------------------
+
+
+def sql_condition(where):
+    """`where` as a SQL condition with ? placeholders, and its parameters."""
+    terms, params = [], []
+    for column, op, value in where:
+        column = f'"{column}"'
+        if op in ("in", "not in"):
+            value = list(value)
+            if not value:
+                terms.append("false" if op == "in" else f"{column} is not null")
+                continue
+            terms.append(f"{column} {op} ({', '.join('?' * len(value))})")
+            params += value
+        elif op == "not null":
+            terms.append(f"{column} is not null")
+        else:
+            terms.append(f"{column} {'=' if op == '==' else op} ?")
+            params.append(value)
+    return " and ".join(terms) or "true", params
+
+
+def month_terms(where, partition_by):
+    """Terms on the month partitions implied by the terms on `partition_by`,
+    so DuckDB skips the files of the months they rule out."""
+    def month(value):
+        return pd.Timestamp(value).strftime("%Y-%m")
+
+    terms = []
+    for column, op, value in where:
+        if column != partition_by:
+            continue
+        if op == "in":
+            terms.append((MONTH, "in", sorted({month(v) for v in value})))
+        elif op in COMPARISONS:
+            terms.append((MONTH, {"<": "<=", ">": ">="}.get(op, op), month(value)))
+    return terms
+
+
+class DuckDBBackend(Backend):
+    def __init__(self, path=None):
+        self.path = Path(path or store_path())
+        self.connection = duckdb.connect()
+
+    def dataset_dir(self, name):
+        return self.path / TABLES[name].split(".")[-1]
+
+    def _from(self, name, where):
+        """FROM clause, condition and parameters of a query on `name`."""
+        directory = self.dataset_dir(name).as_posix()
+        partition_by = PARTITION_BY.get(name)
+        if partition_by is None:
+            table = f"read_parquet('{directory}/data.parquet')"
+        else:
+            table = (
+                f"read_parquet('{directory}/*/*.parquet', hive_partitioning=true, "
+                f"hive_types={{'{MONTH}': 'varchar'}})"
+            )
+            where = list(where) + month_terms(where, partition_by)
+        condition, params = sql_condition(where)
+        return table, condition, params
+
+    def query(self, name, sql, params=()):
+        # a cursor per query: streamlit runs sessions on several threads
+        return _as_dates(name, self.connection.cursor().execute(sql, params).df())
+
+    def load(self, name, columns=None, where=()):
+        if columns is not None:
+            select = ", ".join(f'"{c}"' for c in columns)
+        elif name in PARTITION_BY:
+            select = f"* exclude ({MONTH})"
+        else:
+            select = "*"
+        table, condition, params = self._from(name, where)
+        return self.query(name, f"select {select} from {table} where {condition}", params)
+
+    def aggregate(self, name, by, value, where=()):
+        keys = ", ".join(f'"{c}"' for c in by)
+        table, condition, params = self._from(name, where)
+        return self.query(
+            name,
+            f'select {keys}, sum("{value}")::double as "{value}" from {table} '
+            f"where {condition} group by {keys} order by {keys}",
+            params,
+        )
+
+    def refresh(self, name, full=False, source=None):
+        """Copy `name` into the store from `source` (Snowflake by default).
+        Append-only datasets are topped up from their newest stored month."""
+        source = source or SnowflakeBackend(pushdown=True)
+        directory = self.dataset_dir(name)
+        partition_by = PARTITION_BY.get(name)
+        months = stored_months(directory) if partition_by else []
+
+        if full or name not in INCREMENTAL or not months:
+            write_dataset(source.load(name), directory, partition_by)
+        else:
+            # the newest month may have been partial when it was written
+            since = pd.Timestamp(f"{months[-1]}-01").date()
+            write_dataset(
+                source.load(name, where=[(partition_by, ">=", since)]),
+                directory,
+                partition_by,
+                replace=False,
+            )
+
+
+BACKENDS = {
+    "snowflake": SnowflakeBackend,
+    "excel": ExcelBackend,
+    "parquet": ParquetBackend,
+    "duckdb": DuckDBBackend,
+}
+
+# st.secrets.datasource.source -> backend
+SOURCES = {1: "snowflake", 2: "excel", 3: "duckdb"}
+
+
+def backend_name():
+    datasource = st.secrets.datasource
+    return datasource.get("backend") or SOURCES.get(datasource.source, "snowflake")
+
+
+@st.cache_resource
+def _backend(name, pushdown):
+    if name == "snowflake":
+        return SnowflakeBackend(pushdown=pushdown)
+    return BACKENDS[name]()
+
+
+def get_backend():
+    """The configured backend, shared by every page and session."""
+    return _backend(backend_name(), bool(st.secrets.datasource.get("pushdown", False)))
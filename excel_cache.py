@@ -0,0 +1,120 @@
+"""
+excel_cache.py
+Parquet sidecar cache for the Excel workbooks read by the pages.
+
+A sheet goes through openpyxl only when the workbook's path, size or mtime
+(or the read options) change; otherwise the columnar copy is read back.
+`read_workbook` parses several sheets of one workbook from a single opening.
+
+    <workbook dir>/.parquet_cache/<workbook name>.<options>.<path/size/mtime>.parquet
+"""
+
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_DIR_NAME = ".parquet_cache"
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+def _sidecar(file, cache_dir, kwargs):
+    cache_dir = Path(cache_dir) if cache_dir else file.parent / CACHE_DIR_NAME
+    stat = file.stat()
+    prefix = f"{file.name}.{_digest(sorted(kwargs.items()))}"
+    key = _digest(str(file.resolve()), stat.st_size, stat.st_mtime_ns)
+    return cache_dir / f"{prefix}.{key}.parquet", prefix
+
+
+def read_excel_cached(file, cache_dir=None, **kwargs):
+    """Same as `pd.read_excel(file, **kwargs)` for a single sheet, served from
+    a Parquet sidecar while the workbook is unchanged."""
+    file = Path(file)
+    sidecar, prefix = _sidecar(file, cache_dir, kwargs)
+
+    if sidecar.exists():
+        return pd.read_parquet(sidecar)
+
+    df = pd.read_excel(file, **kwargs)
+    _store(df, sidecar, prefix)
+    return df
+
+
+def _store(df, sidecar, prefix):
+    sidecar.parent.mkdir(parents=True, exist_ok=True)
+    for stale in sidecar.parent.glob(f"{prefix}.*.parquet"):
+        stale.unlink(missing_ok=True)
+
+    # unique per write: threads of one process may store the same sheet at once
+    fd, tmp = tempfile.mkstemp(
+        dir=sidecar.parent, prefix=f"{sidecar.stem}.", suffix=".tmp"
+    )
+    os.close(fd)
+    tmp = Path(tmp)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, sidecar)
+    except (TypeError, ValueError):
+        # mixed-type columns can't be stored as Parquet; serve uncached
+        tmp.unlink(missing_ok=True)
+
+
+def read_workbook(file, sheets, cache_dir=None, engine="openpyxl"):
+    """`{sheet name: read options}` -> `{sheet name: frame}`. Sheets without a
+    fresh sidecar are all parsed from a single opening of the workbook."""
+    file = Path(file)
+    frames, stale = {}, {}
+    for name, kwargs in sheets.items():
+        kwargs = dict(kwargs, sheet_name=name, engine=engine)
+        sidecar, prefix = _sidecar(file, cache_dir, kwargs)
+        if sidecar.exists():
+            frames[name] = pd.read_parquet(sidecar)
+        else:
+            stale[name] = (kwargs, sidecar, prefix)
+
+    if stale:
+        with pd.ExcelFile(file, engine=engine) as workbook:
+            for name, (kwargs, sidecar, prefix) in stale.items():
+                options = {k: v for k, v in kwargs.items() if k != "engine"}
+                frames[name] = workbook.parse(**options)
+                _store(frames[name], sidecar, prefix)
+
+    return {name: frames[name] for name in sheets}
+
+
+def read_excel_jobs(jobs, max_workers=None, cache_dir=None):
+    """Read `(file, read options)` pairs. Sheets without a fresh sidecar are
+    parsed in a pool of `max_workers` processes (serially when there is only
+    one); frames come back in the order of `jobs`."""
+    jobs = [(Path(file), kwargs) for file, kwargs in jobs]
+
+    stale = [
+        i
+        for i, (file, kwargs) in enumerate(jobs)
+        if not _sidecar(file, cache_dir, kwargs)[0].exists()
+    ]
+    if len(stale) <= 1 or max_workers == 1:
+        return [read_excel_cached(file, cache_dir, **kwargs) for file, kwargs in jobs]
+
+    workers = min(len(stale), max_workers or os.cpu_count())
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = {
+            i: pool.submit(read_excel_cached, jobs[i][0], cache_dir, **jobs[i][1])
+            for i in stale
+        }
+
+    return [
+        parsed[i].result() if i in parsed else read_excel_cached(file, cache_dir, **kwargs)
+        for i, (file, kwargs) in enumerate(jobs)
+    ]
+
+
+def read_excel_many(files, max_workers=None, cache_dir=None, **kwargs):
+    """`read_excel_jobs` for several workbooks read with the same options."""
+    return read_excel_jobs([(file, kwargs) for file in files], max_workers, cache_dir)
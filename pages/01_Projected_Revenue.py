@@ -3,127 +3,54 @@ import streamlit as st
 from datetime import datetime, date
 import plotly.express as px
 import plotly.graph_objects as go
-from snowflake.snowpark import Session
 from configparser import ConfigParser
 from pathlib import Path
 
+from datasource import get_backend
 
-@st.cache_data
-def load_data():
-    connection_parameters = {
-        "user": st.secrets.connections.snowflake.user,
-        "password": st.secrets.connections.snowflake.password,
-        "account": st.secrets.connections.snowflake.account,
-        "role": st.secrets.connections.snowflake.role,
-        "warehouse": st.secrets.connections.snowflake.warehouse,
-        "database": st.secrets.connections.snowflake.database,
-        "schema": st.secrets.connections.snowflake.schema,
-    }
-    session = Session.builder.configs(connection_parameters).create()
-
-    _df_sales = session.sql("select * from DB_MIS.PUBLIC.SALES").to_pandas()
-    _df_holiday = session.sql("select * from DB_MIS.PUBLIC.HOLIDAY").to_pandas()
-    _df_invoice = session.sql(
-        "select CLIENT,INV_DATE,DUE_DATE,INV_AMOUNT,DATE_PAID,PAYMENT_AMOUNT,TX_TYPE,INV_YR,INV_MON,PAYMENT_YR,PAYMENT_MON from DB_MIS.PUBLIC.INVOICE"
-    ).to_pandas()
-
-    session.close()
-
-    _df_sales["PERIOD"] = _df_sales["PERIOD"].astype("datetime64[ns]")
-    _df_holiday["HOLIDAY"] = _df_holiday["HOLIDAY"].astype("datetime64[ns]")
-
-    _df_sales = _df_sales.loc[~_df_sales.PROJECT.isnull()]
-    _df_sales = _df_sales.loc[
-        ~_df_sales.PROJECT.isin(
-            ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
-        )
-    ]
-    return _df_sales, _df_holiday, _df_invoice
 
+EXCLUDED_PROJECTS = ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
 
-@st.cache_data
-def load_data2():
-    # config = ConfigParser()
-    # config.read("config.ini")
-    path = st.secrets.billing.path # config["billing"]["path"]
-    file_name_billing = Path(path) / "Billing v3.0.xlsx"
-    file_name_invoice = Path(path) / "BAI Collections as of date.xlsx"
-
-    # sales/rates
-    cols = [
-        "Employee",
-        "Project",
-        "InitRate",
-        "FTE",
-        "Rate",
-        "Period",
-        "Rank",
-        "Level",
-        "Target2",
-        "Billed",
-        "ind_eligibility",
-    ]
-    _df_sales = pd.read_excel(
-        file_name_billing,
-        sheet_name="RateCard",
-        skiprows=1,
-        usecols=cols,
-        engine="openpyxl",
-    )
-    _df_sales = _df_sales.loc[~_df_sales.Project.isnull()]
-    _df_sales = _df_sales.loc[
-        ~_df_sales.Project.isin(
-            ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
-        )
-    ]
-    _df_sales = _df_sales.rename(
-        columns={
-            "InitRate": "INIT_RATE",
-            "Target2": "TARGET",
-            "ind_eligibility": "INDIV_ELIGIBILITY",
-            "Employee": "EMPLOYEE",
-            "Project": "PROJECT",
-            "Period": "PERIOD",
-            "Rank": "RANK",
-            "Level": "LEVEL",
-            "Billed": "BILLED",
-        }
-    )
+# date ranges kept per loader; the least recently used are dropped
+MAX_CACHED = 8
 
-    # holiday
-    _df_holiday = pd.read_excel(
-        file_name_billing,
-        sheet_name="Holidays",
-        parse_dates=["Date"],
-        date_format="%Y-%m-%d",
-        usecols=["Date", "Holiday"],
-        engine="openpyxl",
-        # skiprows=1,
-    )
-    _df_holiday["HOLIDAY_NAME"] = _df_holiday["Holiday"]
-    _df_holiday["HOLIDAY"] = pd.to_datetime(_df_holiday["Date"])
-    # _df_holiday["YYYYMM"] = _df_holiday["Date"].dt.strftime("%Y-%m")
-    # _df_holiday["Month"] = _df_holiday["Date"].dt.strftime("%B")
-
-    # invoice
-    _df_invoice = pd.read_excel(
-        file_name_invoice,
-        sheet_name="Raw",
-    )
-    _df_invoice = _df_invoice.drop(["CURRENCY"], axis=1)
 
-    _df_invoice["INV_YR"] = _df_invoice.apply(lambda x: x["INV_DATE"].year, axis=1)
-    _df_invoice["PAYMENT_YR"] = _df_invoice.apply(lambda x: x["DATE_PAID"].year, axis=1)
-    _df_invoice["INV_DATE"] = (
-        _df_invoice["INV_DATE"].astype("datetime64[ns]").dt.strftime("%Y-%m-%d")
-    )
-    _df_invoice["DATE_PAID"] = (
-        _df_invoice["DATE_PAID"].astype("datetime64[ns]").dt.strftime("%Y-%m-%d")
-    )
-    _df_invoice["DUE_DATE"] = (
-        _df_invoice["DUE_DATE"].astype("datetime64[ns]").dt.strftime("%Y-%m-%d")
+@st.cache_resource(max_entries=MAX_CACHED)
+def load_data(date_start):
+    # only the columns and periods the page charts are read; the three
+    # datasets are fetched together
+    _df_sales, _df_holiday, _df_invoice = get_backend().load_many(
+        [
+            (
+                "sales",
+                ["PROJECT", "PERIOD", "FTE", "INIT_RATE", "TARGET", "BILLED"],
+                [
+                    ("PERIOD", ">=", pd.Timestamp(date_start).date()),
+                    ("PROJECT", "not null", None),
+                    ("PROJECT", "not in", EXCLUDED_PROJECTS),
+                ],
+            ),
+            ("holidays", ["HOLIDAY", "HOLIDAY_NAME"], ()),
+            (
+                "invoices",
+                [
+                    "CLIENT",
+                    "INV_DATE",
+                    "DUE_DATE",
+                    "INV_AMOUNT",
+                    "DATE_PAID",
+                    "PAYMENT_AMOUNT",
+                    "TX_TYPE",
+                    "INV_YR",
+                    "INV_MON",
+                    "PAYMENT_YR",
+                    "PAYMENT_MON",
+                ],
+                # the page reports on invoices from 2024 on
+                [("INV_DATE", ">=", date(2024, 1, 1))],
+            ),
+        ]
     )
-    # _df_invoice = _df_invoice.loc[:4]
 
     return _df_sales, _df_holiday, _df_invoice
 
@@ -440,20 +367,23 @@ def main():
     st.title(":bar_chart: Projected Revenue")
 
     def load_holidays():
-        df_holiday["YYYYMM"] = df_holiday["HOLIDAY"].dt.strftime("%Y-%m")
-        df_holiday["Month"] = df_holiday["HOLIDAY"].dt.strftime("%B")
+        # df_holiday is the cached frame; derive from it, never assign into it
+        _df_holiday = df_holiday.assign(
+            YYYYMM=df_holiday["HOLIDAY"].dt.strftime("%Y-%m"),
+            Month=df_holiday["HOLIDAY"].dt.strftime("%B"),
+        )
 
-        df_cur = df_holiday.loc[
-            (df_holiday["HOLIDAY"].dt.year == datetime.today().year)
-            & (df_holiday["HOLIDAY"].dt.month == datetime.today().month)
+        df_cur = _df_holiday.loc[
+            (_df_holiday["HOLIDAY"].dt.year == datetime.today().year)
+            & (_df_holiday["HOLIDAY"].dt.month == datetime.today().month)
             ]
         df_cur["HOLIDAY"] = df_cur["HOLIDAY"].dt.strftime("%Y-%m-%d")
 
         col1, col2 = st.columns(2)
         with col1:
             st.header("Number of Holidays in " + date.today().strftime("%Y"))
-            df_yr = df_holiday.loc[
-                df_holiday["HOLIDAY"].dt.year == datetime.today().year
+            df_yr = _df_holiday.loc[
+                _df_holiday["HOLIDAY"].dt.year == datetime.today().year
                 ]
 
             df_yr2 = df_yr.groupby(["YYYYMM"], as_index=False).agg(
@@ -478,10 +408,7 @@ def main():
         # config = ConfigParser()
         # config.read("config.ini")
 
-        if st.secrets.datasource.source == 2: # config["datasource"]["source"] == "2":
-            df_rates, df_holiday, df_invoice = load_data2()
-        else:
-            df_rates, df_holiday, df_invoice = load_data()
+        df_rates, df_holiday, df_invoice = load_data(date_start)
 
         df_invoice = df_invoice.loc[
             (df_invoice["INV_YR"] >= 2024)
@@ -513,5 +440,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
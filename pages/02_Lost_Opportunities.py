@@ -2,85 +2,42 @@ import pandas as pd
 import plotly.express as px
 import streamlit as st
 import numpy as np
-from snowflake.snowpark import Session
 from pathlib import Path
 from configparser import ConfigParser
 from datetime import date, timedelta
 
-
-@st.cache_data
-def load_data():
-    connection_parameters = {
-        "user": st.secrets.connections.snowflake.user,
-        "password": st.secrets.connections.snowflake.password,
-        "account": st.secrets.connections.snowflake.account,
-        "role": st.secrets.connections.snowflake.role,
-        "warehouse": st.secrets.connections.snowflake.warehouse,
-        "database": st.secrets.connections.snowflake.database,
-        "schema": st.secrets.connections.snowflake.schema,
-    }
-    session = Session.builder.configs(connection_parameters).create()
-
-    _df_sales = session.sql("select * from DB_MIS.PUBLIC.SALES").to_pandas()
-
-    session.close()
-
-    _df_sales = _df_sales.loc[~_df_sales.PROJECT.isnull()]
-    _df_sales = _df_sales.loc[
-        ~_df_sales.PROJECT.isin(
-            ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
-        )
-    ]
-    return _df_sales
-
-
-@st.cache_data
-def load_data2():
-    # config = ConfigParser()
-    # config.read("config.ini")
-    # file_name = Path(config["billing"]["path"]) / "Billing v3.0.xlsx"
-    file_name = Path(st.secrets.billing.path) / "Billing v3.0.xlsx"
-    # sales/rates
-    cols = [
-        "Employee",
-        "Project",
-        "InitRate",
-        "FTE",
-        "Rate",
-        "Period",
-        "Rank",
-        "Level",
-        "Target2",
-        "Billed",
-        "ind_eligibility",
-    ]
-    _df_sales = pd.read_excel(
-        file_name,
-        sheet_name="RateCard",
-        skiprows=1,
-        usecols=cols,
-        engine="openpyxl",
-    )
-    _df_sales = _df_sales.loc[~_df_sales.Project.isnull()]
-    _df_sales = _df_sales.loc[
-        ~_df_sales.Project.isin(
-            ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
-        )
-    ]
-    _df_sales = _df_sales.rename(
-        columns={
-            "InitRate": "INIT_RATE",
-            "Target2": "TARGET",
-            "ind_eligibility": "INDIV_ELIGIBILITY",
-            "Employee": "EMPLOYEE",
-            "Project": "PROJECT",
-            "Period": "PERIOD",
-            "Rank": "RANK",
-            "Level": "LEVEL",
-            "Billed": "BILLED",
-        }
+from datasource import get_backend
+
+
+EXCLUDED_PROJECTS = ["PlancareX", "RivingtonX", "iScanX", "RevivaX", "TempestX"]
+
+# date ranges kept per loader; the least recently used are dropped
+MAX_CACHED = 8
+
+
+@st.cache_resource(max_entries=MAX_CACHED)
+def load_data(date_start, date_end):
+    # only the columns and periods the page shows are read
+    return get_backend().load(
+        "sales",
+        [
+            "EMPLOYEE",
+            "PROJECT",
+            "INIT_RATE",
+            "PERIOD",
+            "RANK",
+            "LEVEL",
+            "TARGET",
+            "BILLED",
+            "INDIV_ELIGIBILITY",
+        ],
+        where=[
+            ("PERIOD", ">=", date_start.date()),
+            ("PERIOD", "<=", date_end.date()),
+            ("PROJECT", "not null", None),
+            ("PROJECT", "not in", EXCLUDED_PROJECTS),
+        ],
     )
-    return _df_sales
 
 
 def main():
@@ -92,26 +49,6 @@ def main():
     # config = ConfigParser()
     # config.read("config.ini")
 
-    # if config["datasource"]["source"] == "2":
-    if st.secrets.datasource.source == 2:
-        df = load_data2()
-    else:
-        df = load_data()
-
-    df = df.rename(
-        columns={
-            "EMPLOYEE": "Employee",
-            "PROJECT": "Project",
-            "INIT_RATE": "InitRate",
-            "PERIOD": "Period",
-            "RANK": "Rank",
-            "LEVEL": "Level",
-            "TARGET": "Target",
-            "BILLED": "Billed",
-            "INDIV_ELIGIBILITY": "ind_eligibility",
-        }
-    )
-
     date1 = date.today()
     date1 = date(date1.year, date1.month, 1) - timedelta(days=1)
     date1 = date(date1.year, date1.month, 1)
@@ -128,18 +65,30 @@ def main():
     with col3:
         threshhold_applied = st.toggle("Apply threshhold?", True)
 
+    df = load_data(date_start, date_end)
+
+    df = df.rename(
+        columns={
+            "EMPLOYEE": "Employee",
+            "PROJECT": "Project",
+            "INIT_RATE": "InitRate",
+            "PERIOD": "Period",
+            "RANK": "Rank",
+            "LEVEL": "Level",
+            "TARGET": "Target",
+            "BILLED": "Billed",
+            "INDIV_ELIGIBILITY": "ind_eligibility",
+        }
+    )
+
     df["Period"] = df["Period"].astype("datetime64[ns]")
 
     # filter out those not within specified date range
     df = df.loc[(df["Period"] >= date_start) & (df["Period"] <= date_end)]
 
-    df["Shortfall"] = df.apply(
-        lambda x: 0 if x["ind_eligibility"] == 1 else x["Target"] - x["Billed"], axis=1
-    )
-    df["ShortfallAmt"] = df.apply(
-        lambda x: 0.0 if x["ind_eligibility"] == 1 else x["Shortfall"] * x["InitRate"],
-        axis=1,
-    )
+    is_eligible = df["ind_eligibility"] == 1
+    df["Shortfall"] = np.where(is_eligible, 0, df["Target"] - df["Billed"])
+    df["ShortfallAmt"] = np.where(is_eligible, 0.0, df["Shortfall"] * df["InitRate"])
 
     df = df.loc[~(df["Shortfall"]).isna() & (df["Shortfall"] > 0)]
     df_filt = df[
@@ -189,8 +138,8 @@ def main():
                 st.dataframe(
                     df.loc[
                         (
-                                ((df["ind_eligibility"] == 0.0) & (with_threshhold))
-                                | ((df["ind_eligibility"] != 1.0) & (~with_threshhold))
+                                ((df["ind_eligibility"] == 0.0) & (threshhold_applied))
+                                | ((df["ind_eligibility"] != 1.0) & (~threshhold_applied))
                         ),
                         [
                             "Project",
@@ -214,5 +163,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
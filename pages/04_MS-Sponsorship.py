@@ -5,24 +5,29 @@ from configparser import ConfigParser
 from pathlib import Path
 from datetime import datetime
 
+from usage_csv import aggregate_exports, list_exports
 
-@st.cache_data
-def load_data2():
+
+def find_exports():
     # config = ConfigParser()
     # config.read("config.ini")
     # path = config["sponsorship"]["path"]
     path = st.secrets.sponsorshipnoel.path
 
-    def load_monthly(file):
-        df: pd.DataFrame = pd.read_csv(
-            file,
-        )
-        return df
+    # every monthly export in the folder, unless `pattern` narrows it down
+    return list_exports(path, st.secrets.sponsorshipnoel.get("pattern", "*.csv"))
 
-    # arr = sorted(Path(path).glob("* 2024-*.csv"))
-    arr = sorted(Path(path).glob("BAI Azure Sponsorship - Aug 1 to Oct 10 2024.csv"))
-    arr_df = [load_monthly(el) for el in arr]
-    df = pd.concat(arr_df).loc[:,["Date", "ServiceName", "ServiceType", "ServiceResource", "Cost"]]
+
+@st.cache_resource
+def load_data2(exports):
+    # each export is streamed and summed per day once; the manifest lets later
+    # loads parse only the new or changed files
+    df = aggregate_exports(
+        exports,
+        ["Date", "ServiceName", "ServiceType", "ServiceResource"],
+        max_workers=st.secrets.sponsorshipnoel.get("workers"),
+    )
+    df["ReportDate"] = df["Date"].dt.strftime("%Y-%m")
 
     return df
 
@@ -34,9 +39,7 @@ def main():
 
     sponsor_container = st.container()
 
-    df = load_data2()
-    df["Date"] = df["Date"].astype("datetime64[ns]")
-    df["ReportDate"] = df["Date"].dt.strftime("%Y-%m")
+    df = load_data2(find_exports())
 
     df3 = df.groupby(["ServiceName"], as_index=False).agg({"Cost": "sum"})
     df4 = df.groupby(["ServiceResource"], as_index=False).agg({"Cost": "sum"})
@@ -98,5 +101,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
@@ -5,27 +6,77 @@ from configparser import ConfigParser
 from pathlib import Path
 from datetime import datetime
 
+from usage_csv import aggregate_exports, list_exports
 
-@st.cache_data
-def load_data2():
+
+def find_exports():
     # config = ConfigParser()
     # config.read("config.ini")
     # path = config["sponsorshippam"]["path"]
     path = st.secrets.sponsorshippam.path
 
-    def load_monthly(file):
-        df: pd.DataFrame = pd.read_csv(
-            file,
-        )
-        return df
+    # every monthly export in the folder, unless `pattern` narrows it down
+    return list_exports(path, st.secrets.sponsorshippam.get("pattern", "*.csv"))
 
-    # arr = sorted(Path(path).glob("*.csv"))
-    arr = sorted(Path(path).glob("AzureUsage-6.csv"))
-    arr_df = [load_monthly(el) for el in arr]
-    df = pd.concat(arr_df).loc[:,["Date", "ServiceName", "ServiceType", "ServiceRegion", "ServiceResource", "Cost"]]
+
+def load_data2(exports):
+    # each export is streamed and summed per day once; the manifest lets later
+    # loads parse only the new or changed files
+    df = aggregate_exports(
+        exports,
+        ["Date", "ServiceName", "ServiceType", "ServiceRegion", "ServiceResource"],
+        max_workers=st.secrets.sponsorshippam.get("workers"),
+    )
+    df["ReportDate"] = df["Date"].dt.strftime("%Y-%m")
 
     return df
 
+
+@st.cache_resource
+def load_rollups(exports):
+    """Every aggregate the page charts, from a single scan of the usage rows
+    (which are not kept in the cache themselves).
+
+    The rows are summed once to ReportDate x ServiceName x ServiceType x
+    ServiceRegion x ServiceResource; the charted rollups come from that much
+    smaller frame. Rollups behind a threshold are kept sorted by their value
+    so `in_range` can slice them."""
+    df = load_data2(exports)
+
+    fine = df.groupby(
+        ["ReportDate", "ServiceName", "ServiceType", "ServiceRegion", "ServiceResource"],
+        as_index=False,
+        dropna=False,
+    ).Cost.sum()
+
+    def rollup(keys, name="Cost"):
+        return fine.groupby(keys, as_index=False).agg(**{name: ("Cost", "sum")})
+
+    def by_value(_df, name="Cost"):
+        # stable sort keeps the key-order index labels for in_range
+        return _df.sort_values(name, kind="stable")
+
+    return {
+        "total_cost": fine["Cost"].sum(),
+        "max_date": df["Date"].max(),
+        "month": rollup(["ReportDate"]),
+        "service": rollup(["ServiceName"]),
+        "resource": by_value(rollup(["ServiceResource"])),
+        "region": by_value(rollup(["ServiceRegion"])),
+        "month_service": by_value(rollup(["ReportDate", "ServiceName"], "Total"), "Total"),
+        "month_type": by_value(rollup(["ReportDate", "ServiceType"], "Total"), "Total"),
+    }
+
+
+def in_range(_df, low=-np.inf, high=np.inf, column="Cost", inclusive=False):
+    """Rows with low < column < high (low <= column when `inclusive`) of a
+    rollup sorted by `column`, found by binary search and put back in key order."""
+    values = _df[column].to_numpy()
+    start = values.searchsorted(low, side="left" if inclusive else "right")
+    end = values.searchsorted(high, side="left")
+    return _df.iloc[start:end].sort_index()
+
+
 def main():
     st.set_page_config(page_title="MIS Report", page_icon=":bar_chart:", layout="wide")
 
@@ -33,9 +84,7 @@ def main():
 
     sponsor_container = st.container()
 
-    df = load_data2()
-    df["Date"] = df["Date"].astype("datetime64[ns]")
-    df["ReportDate"] = df["Date"].dt.strftime("%Y-%m")
+    rollups = load_rollups(find_exports())
 
     with sponsor_container:
 
@@ -45,7 +94,7 @@ def main():
         fig = px.bar(
             # df.groupby(pd.Grouper(key="Date", freq="ME")).agg(Cost=("Cost", "sum")).reset_index(),
             # df2,
-            df.groupby(["ReportDate"], as_index=False).agg({"Cost": "sum"})
+            rollups["month"]
             , x="ReportDate"
             , y="Cost"
             , text_auto=True
@@ -60,8 +109,8 @@ def main():
         """
         Running Total text
         """
-        total_cost: float = df["Cost"].sum()
-        max_date: datetime = df["Date"].max().strftime("%b %-d, %Y")
+        total_cost: float = rollups["total_cost"]
+        max_date: datetime = rollups["max_date"].strftime("%b %-d, %Y")
 
         st.write("Running Total: $ {0:,.2f} as of {1}".format(total_cost, max_date))
 
@@ -72,7 +121,7 @@ def main():
         #
         fig = px.bar(
             # df.groupby(pd.Grouper(key="Date", freq="ME")).agg({"Cost": sum}),
-            df.groupby(["ServiceName"], as_index=False).agg({"Cost": "sum"})
+            rollups["service"]
             , x="ServiceName"
             , y="Cost"
             , text_auto=True
@@ -90,10 +139,7 @@ def main():
         #
         fig = px.bar(
             # df.groupby(pd.Grouper(key="Date", freq="ME")).agg({"Cost": sum}),
-            df
-            .groupby(["ServiceResource"], as_index=False)
-            .agg({"Cost": "sum"})
-            .query("Cost >= 20.0")
+            in_range(rollups["resource"], 20.0, inclusive=True)
             , x="ServiceResource"
             , y="Cost"
             , text_auto=True
@@ -111,9 +157,7 @@ def main():
         #
         fig = px.bar(
             # df.groupby(pd.Grouper(key="Date", freq="ME")).agg({"Cost": sum}),
-            df
-            .groupby(["ServiceResource"], as_index=False).agg({"Cost": "sum"})
-            .query("20 > Cost > 1.0")
+            in_range(rollups["resource"], 1.0, 20)
             , x="ServiceResource"
             , y="Cost"
             , text_auto=True
@@ -130,10 +174,7 @@ def main():
         # By Service Region
         #
         fig = px.bar(
-            df
-            .groupby("ServiceRegion", as_index=False)
-            .agg({"Cost": "sum"})
-            .pipe(lambda _df: _df.loc[(_df.Cost > 1000)])
+            in_range(rollups["region"], 1000)
             , x="ServiceRegion"
             , y="Cost"
             , text_auto=True
@@ -151,10 +192,7 @@ def main():
         # Monthly Cost By Service Name (> 500)
         #
         fig = px.bar(
-            df
-            .groupby(["ReportDate", "ServiceName"], as_index=False)
-            .agg(Total=("Cost", "sum"))
-            .query("Total > 500")
+            in_range(rollups["month_service"], 500, column="Total")
             , x="ReportDate"
             , y="Total"
             , facet_row= "ServiceName"
@@ -176,10 +214,7 @@ def main():
         #     .groupby(["ReportDate", "ServiceType"], as_index=False)
         #     .agg(Total=("Cost", "sum")).query("Total>500"))
         fig = px.bar(
-            df
-            .groupby(["ReportDate", "ServiceType"], as_index=False)
-            .agg(Total=("Cost", "sum"))
-            .query("Total > 500")
+            in_range(rollups["month_type"], 500, column="Total")
             , x="ReportDate"
             , y="Total"
             , facet_row= "ServiceType"
@@ -196,5 +231,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,12 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from snowflake.snowpark import Session
 from pathlib import Path
 from configparser import ConfigParser
 from datetime import date, timedelta
 
+from datasource import get_backend
+
 
 XAMUN_PROJS = [
     "Xamun",
@@ -21,6 +22,11 @@ XAMUN_PROJS = [
     "BPS",
 ]
 
+EMPLOYEE_TYPES = ["Interns", "Xamun", "DD/QRI"]
+
+# date ranges kept by load_xamun_eod; the least recently used are dropped
+MAX_CACHED = 8
+
 XAMUN_CORE = [
     "Aevin Earl Molina",
     "Allen Christian Tubo",
@@ -33,26 +39,20 @@ XAMUN_CORE = [
 ]
 
 
-@st.cache_data
-def load_data():
-    connection_parameters = {
-        "user": st.secrets.connections.snowflake.user,
-        "password": st.secrets.connections.snowflake.password,
-        "account": st.secrets.connections.snowflake.account,
-        "role": st.secrets.connections.snowflake.role,
-        "warehouse": st.secrets.connections.snowflake.warehouse,
-        "database": st.secrets.connections.snowflake.database,
-        "schema": st.secrets.connections.snowflake.schema,
-    }
-    session = Session.builder.configs(connection_parameters).create()
-
-    _df_employee_all = session.sql("select * from DB_MIS.PUBLIC.EMPLOYEE").to_pandas()
-    _df_eod = session.sql("select * from DB_MIS.PUBLIC.EOD").to_pandas()
-
-    session.close()
+def index_by_date(df_eod):
+    # sorted DatetimeIndex: date ranges are sliced by binary search
+    df_eod = df_eod.sort_values("Date", kind="stable")
+    df_eod.index = pd.DatetimeIndex(df_eod["Date"]).rename(None)
+    return df_eod
+
 
+@st.cache_resource
+def load_employees():
     # remove dummy records
-    _df_employee_all = _df_employee_all.loc[(_df_employee_all["COMPANY"] != "DUMMY")]
+    # (all columns: the page slices "Employee":"Account" by table position)
+    _df_employee_all = get_backend().load(
+        "employees", where=[("COMPANY", "is distinct from", "DUMMY")]
+    )
 
     _df_employee_all = _df_employee_all.rename(
         columns={
@@ -68,14 +68,22 @@ def load_data():
             "INCLUDE": "Include",
         }
     )
-    _df_employee = _df_employee_all.loc[
-        :, ["Employee", "Resigned", "LastDay", "Rank", "Level", "Start", "Account"]
-    ]
-
     _df_employee = _df_employee_all.loc[
         (_df_employee_all["Include"] == 1), "Employee":"Account"
     ]
-    _df_employee_all.drop(columns=["Include"], inplace=True)
+
+    return _df_employee, _df_employee_all
+
+
+@st.cache_resource
+def load_data():
+    # the whole log of the accounts the page charts, read once; date ranges
+    # are sliced off its sorted index (load_xamun_eod)
+    _df_eod = get_backend().load(
+        "eod",
+        ["EMPLOYEE", "DATE", "ACCOUNT", "HOURS", "MINUTES"],
+        where=[("ACCOUNT", "in", XAMUN_PROJS + ["Data Analytics", "SwiftLoan"])],
+    )
 
     _df_eod = _df_eod.rename(
         columns={
@@ -86,88 +94,33 @@ def load_data():
             "MINUTES": "Minutes",
         }
     )
-    _df_eod["TotalHrs"] = _df_eod.apply(
-        lambda x: ((x["Hours"] * 60) + x["Minutes"]) / 60, axis=1
-    )
-    _df_eod["Date"] = _df_eod["Date"].astype("datetime64[ns]")
-
-    return _df_employee, _df_eod, _df_employee_all
-
-
-@st.cache_data
-def load_data2():
-    # config = ConfigParser()
-    # config.read("config.ini")
-    # path_billing = config["billing"]["path"]
-    path_billing = st.secrets.billing.path
-    # path_eod = config["eod"]["path"]
-    path_eod = st.secrets.eod.path
-    file_name_billing = Path(path_billing) / "Billing v3.0.xlsx"
-    file_name_eod = Path(path_eod) / "BAI EOD Log Report V2.xlsx"
-
-    _df_eod = pd.read_excel(
-        file_name_eod,
-        usecols=["EmployeeName", "Date", "Account", "Hours", "Minutes"],
-        dtype={"Date": "datetime64[ns]"},
-        engine="openpyxl",
-    )
-    _df_eod["TotalHrs"] = _df_eod.apply(
-        lambda x: ((x["Hours"] * 60) + x["Minutes"]) / 60, axis=1
-    )
+    _df_eod["TotalHrs"] = ((_df_eod["Hours"] * 60) + _df_eod["Minutes"]) / 60
+
+    return index_by_date(_df_eod)
 
-    # FTEs
-    # _df_emp = pd.read_excel(
-    #     file_name_billing,
-    #     usecols=[
-    #         "Employee",
-    #         "GRP",
-    #         "Resigned",
-    #         "LastDay",
-    #         "Rank",
-    #         "Level",
-    #         "Start",
-    #         "Account",
-    #         "Include",
-    #     ],
-    #     sheet_name="employees",
-    # )
-    # _df_emp["temp"] = _df_emp["Resigned"].apply(lambda x: True if x == "X" else False)
-    # _df_emp["Resigned"] = _df_emp["temp"]
-
-    # _df_emp = _df_emp.loc[(_df_emp["Include"] == 1)]
-    # _df_emp.drop(columns=["temp", "Include"], inplace=True)
-
-    # all employees
-    _df_emp_all = pd.read_excel(
-        file_name_billing,
-        sheet_name="employees",
-        # usecols=[
-        #     "Employee",
-        #     "GRP",
-        #     "Resigned",
-        #     "LastDay",
-        #     "Rank",
-        #     "Level",
-        #     "Start",
-        #     "Account",
-        #     "GRP2",
-        #     "Company",
-        #     "Include",
-        #     "Remarks",
-        #     "XamunBilledProj"
-        # ],
-    )
-    # remove dummy records
-    _df_emp_all = _df_emp_all.loc[(_df_emp_all["Company"] != "DUMMY")]
 
-    # convert "X" to boolean True and blank to False
-    _df_emp_all["temp"] = _df_emp_all["Resigned"].apply(
-        lambda x: True if x == "X" else False
+@st.cache_resource(max_entries=MAX_CACHED)
+def load_xamun_eod(date_start, date_end):
+    """EOD hours on the Xamun accounts and Data Analytics within the date
+    range, each row tagged once with the person's Type."""
+    df_emp, _ = load_employees()
+    df_eod = load_data()
+
+    # slice the date range off the sorted index (only the accounts are loaded)
+    df_eod = df_eod.loc[pd.Timestamp(date_start) : pd.Timestamp(date_end)]
+
+    # interns: not in the employee list; DD/QRI: GRP not starting with X
+    names = df_eod["EmployeeName"]
+    df_dd = df_emp.loc[(~df_emp["GRP"].str.startswith("X")), "Employee"]
+    codes = np.select(
+        [~names.isin(df_emp["Employee"]), names.isin(df_dd)], [0, 2], default=1
     )
-    _df_emp_all["Resigned"] = _df_emp_all["temp"]
-    _df_emp_all.drop(columns=["temp"], inplace=True)
 
-    return _df_eod, _df_emp_all
+    # change SwiftLoan into Xamun Solutions
+    return df_eod.assign(
+        Account=df_eod["Account"].replace("SwiftLoan", "Xamun Solutions"),
+        Type=pd.Categorical.from_codes(codes, EMPLOYEE_TYPES),
+    )
 
 
 def main():
@@ -196,75 +149,22 @@ def main():
         date_start = date_start.strftime("%Y%m%d")
         date_end = date_end.strftime("%Y%m%d")
 
-        if st.secrets.datasource.source == 2:
-            df_eod, df_emp_all = load_data2()
-            df_emp = df_emp_all.loc[(df_emp_all["Include"] == 1), "Employee":"Account"]
-        else:
-            df_emp, df_eod, df_emp_all = load_data()
-
-        # change SwiftLoan into Xamun Solutions
-        df_eod.loc[(df_eod["Account"] == "SwiftLoan"), "Account"] = "Xamun Solutions"
-
-        # df_dd = df_emp.loc[(~df_emp["GRP"].str.upper().str.startswith("X"))]
-        df_dd = df_emp.loc[(~df_emp["GRP"].str.startswith("X"))]
+        df_emp, df_emp_all = load_employees()
 
-        # filter by date range and filter-out non Xamun accts
-        df_eod_xamun_projs = df_eod.loc[
-            (df_eod["Date"] >= date_start)
-            & (df_eod["Date"] <= date_end)
-            & (df_eod.Account.isin(XAMUN_PROJS))
-            ]
-        df_eod_xamun_projs_with_da = df_eod.loc[
-            (df_eod["Date"] >= date_start)
-            & (df_eod["Date"] <= date_end)
-            & (df_eod.Account.isin(XAMUN_PROJS + ["Data Analytics"]))
-            ]
-        df_analytics = df_eod.loc[
-            (df_eod.Date >= date_start)
-            & (df_eod.Date <= date_end)
-            & (df_eod.Account == "Data Analytics")
-            ]
-
-        interns = (
-            df_eod_xamun_projs.loc[
-                (
-                    ~df_eod_xamun_projs["EmployeeName"].isin(df_emp["Employee"]),
-                    "EmployeeName",
-                )
-            ]
-            .unique()
-            .tolist()
-        )
-        # interns
-
-        # interns
-        # _df = df_eod_xamun_projs.groupby(
-        #     ["EmployeeName", "Account"], as_index=False
-        # ).TotalHrs.sum()
-
-        def get_type(row):
-            if row.EmployeeName in (interns):
-                return 1
-            elif row.EmployeeName in (df_dd.Employee.to_list()):
-                return 3
-            else:
-                return 2
-
-        def get_type_name(value):
-            if value == 1:
-                return "Interns"
-            elif value == 3:
-                return "DD/QRI"
-            else:
-                return "Xamun"
+        df_eod_xamun_projs_with_da = load_xamun_eod(date_start, date_end)
+        df_eod_xamun_projs = df_eod_xamun_projs_with_da.loc[
+            (df_eod_xamun_projs_with_da.Account.isin(XAMUN_PROJS))
+        ]
+        df_analytics = df_eod_xamun_projs_with_da.loc[
+            (df_eod_xamun_projs_with_da.Account == "Data Analytics")
+        ]
 
         # chart 1: hrs
         col1, col2, col3 = st.columns([0.5, 0.25, 0.25])
 
         _df1 = df_eod_xamun_projs.groupby(
-            ["EmployeeName"], as_index=False
+            ["EmployeeName", "Type"], as_index=False, observed=True
         ).TotalHrs.sum()
-        _df1["Type"] = _df1.apply(lambda x: get_type(x), axis="columns")
 
         with col1:
 
@@ -308,11 +208,10 @@ def main():
 
             # Total Hrs By Type
 
-            _df2 = _df1.groupby(["Type"], as_index=False).TotalHrs.sum()
-            _df2["TypeName"] = _df2["Type"].apply(lambda x: get_type_name(x))
+            _df2 = _df1.groupby(["Type"], as_index=False, observed=True).TotalHrs.sum()
 
             fig = px.pie(
-                _df2, values="TotalHrs", names="TypeName", title="Total Hrs By Type"
+                _df2, values="TotalHrs", names="Type", title="Total Hrs By Type"
             )
             fig.update_traces(showlegend=False)
             st.plotly_chart(fig, use_container_width=True)
@@ -341,13 +240,14 @@ def main():
             # # fig.update_layout(template=2)
             # st.plotly_chart(fig, use_container_width=True, height=200)
 
-            _df2 = _df1.groupby(["Type"], as_index=False).EmployeeName.count()
-            _df2["TypeName"] = _df2["Type"].apply(lambda x: get_type_name(x))
+            _df2 = _df1.groupby(
+                ["Type"], as_index=False, observed=True
+            ).EmployeeName.count()
 
             fig = px.pie(
                 _df2,
                 values="EmployeeName",
-                names="TypeName",
+                names="Type",
                 title="Head Count By Type",
             )
             st.plotly_chart(fig, use_container_width=True)
@@ -378,10 +278,7 @@ def main():
         #               XAMUN FTEs - not interns nor DD's
         #
         #####################################################################
-        _df = df_eod_xamun_projs.loc[
-            (~df_eod_xamun_projs.EmployeeName.isin(interns))
-            & (~df_eod_xamun_projs.EmployeeName.isin(df_dd.Employee))
-            ]
+        _df = df_eod_xamun_projs.loc[(df_eod_xamun_projs.Type == "Xamun")]
         _df = (
             _df.groupby(["Account", "EmployeeName"], as_index=False)
             .TotalHrs.sum()
@@ -410,9 +307,7 @@ def main():
         #     # ~(df_eod_xamun_projs.EmployeeName.isin(interns))
         #     (df_eod_xamun_projs.EmployeeName.isin(df_dd.Employee))
         # ]
-        _df = df_eod_xamun_projs.loc[
-            (df_eod_xamun_projs.EmployeeName.isin(df_dd.Employee))
-        ]
+        _df = df_eod_xamun_projs.loc[(df_eod_xamun_projs.Type == "DD/QRI")]
         _df = (
             _df.groupby(["Account", "EmployeeName"], as_index=False)
             .TotalHrs.sum()
@@ -438,7 +333,7 @@ def main():
         #
         #####################################################################
         _df = df_eod_xamun_projs.loc[
-            (df_eod_xamun_projs.EmployeeName.isin(interns))
+            (df_eod_xamun_projs.Type == "Interns")
         ].sort_values("EmployeeName")
         _df = _df.groupby(["Account", "EmployeeName"], as_index=False).TotalHrs.sum()
         fig = px.bar(
@@ -484,8 +379,7 @@ def main():
         #
         #####################################################################
         _df = df_eod_xamun_projs.loc[
-            (~df_eod_xamun_projs.EmployeeName.isin(interns))
-            & (~df_eod_xamun_projs.EmployeeName.isin(df_dd.Employee))
+            (df_eod_xamun_projs.Type == "Xamun")
             & (df_eod_xamun_projs["Account"] == "Xamun")
             & (df_eod_xamun_projs["EmployeeName"].isin(XAMUN_CORE))
             ]
@@ -515,8 +409,7 @@ def main():
         #
         #####################################################################
         _df = df_eod_xamun_projs.loc[
-            (~df_eod_xamun_projs.EmployeeName.isin(interns))
-            & (~df_eod_xamun_projs.EmployeeName.isin(df_dd.Employee))
+            (df_eod_xamun_projs.Type == "Xamun")
             & (df_eod_xamun_projs["Account"] == "Xamun")
             & (~df_eod_xamun_projs["EmployeeName"].isin(XAMUN_CORE))
             ]
@@ -581,6 +474,11 @@ def main():
                 .reset_index()
             )
             df.index = range(1, len(df) + 1)
+            types = df.EmployeeName.map(
+                df_eod_xamun_projs.drop_duplicates("EmployeeName")
+                .set_index("EmployeeName")
+                .Type
+            )
 
             st.subheader("All")
             dfx = df.style.format(precision=2)
@@ -593,7 +491,7 @@ def main():
             # st.plotly_chart(fig, use_container_width=True, height=200)
 
             st.subheader("Interns")
-            df1 = df.loc[df.EmployeeName.isin(interns)]
+            df1 = df.loc[types == "Interns"]
             df1.index = range(1, len(df1) + 1)
             # df1 = df1.reset_index(drop=True).style.format(precision=2)
             df1 = df1.style.format(precision=2)
@@ -606,10 +504,7 @@ def main():
 
             st.subheader("Xamun FTEs")
             df2 = (
-                df.loc[
-                    (~df.EmployeeName.isin(interns))
-                    & (~df.EmployeeName.isin(df_dd.Employee))
-                    ].reset_index(drop=True)
+                df.loc[types == "Xamun"].reset_index(drop=True)
                 # .style.format(precision=2)
             )
             df2.index = range(1, len(df2) + 1)
@@ -621,10 +516,7 @@ def main():
 
             st.subheader("FTEs from DD/QRI")
             df2 = (
-                df.loc[
-                    (~df.EmployeeName.isin(interns))
-                    & (df.EmployeeName.isin(df_dd.Employee))
-                    ].reset_index(drop=True)
+                df.loc[types == "DD/QRI"].reset_index(drop=True)
                 # .style.format(precision=2)
             )
             df2.index = range(1, len(df2) + 1)
@@ -1379,5 +1271,5 @@ def main():
     return None
 
 
-# if __name__ == "__main__":
-main()
+if __name__ == "__main__":
+    main()
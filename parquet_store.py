@@ -0,0 +1,106 @@
+"""
+parquet_store.py
+Month-partitioned Parquet copy of the datasets, queried by the duckdb backend.
+
+    <store>/<TABLE>/month=2024-07/data.parquet   datasets with a date to split on
+    <store>/<TABLE>/data.parquet                 the rest
+
+A query that filters on the partitioning date only opens the months it needs.
+The store is written from another backend:
+
+    python parquet_store.py                       # every dataset from Snowflake
+    python parquet_store.py --from excel --full azure_usage eod
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from cli import one_of
+
+MONTH = "month"
+NULL_MONTH = "NULL"
+
+
+def _write_atomic(df, file):
+    # unique per write: refreshes may run on several threads of one process
+    fd, tmp = tempfile.mkstemp(dir=file.parent, prefix=f"{file.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, file)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def stored_months(directory):
+    """The months stored under `directory`, oldest first."""
+    return sorted(
+        d.name.split("=", 1)[1]
+        for d in Path(directory).glob(f"{MONTH}=*")
+        if d.name != f"{MONTH}={NULL_MONTH}"
+    )
+
+
+def write_dataset(df, directory, partition_by=None, replace=True):
+    """Write `df` under `directory`, one file per month of `partition_by`.
+    With `replace` months that are not in `df` are dropped; without it only
+    the months in `df` are rewritten."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if partition_by is None:
+        _write_atomic(df, directory / "data.parquet")
+        return
+
+    # sorted rows keep each file's row-group statistics tight
+    df = df.sort_values(partition_by, kind="stable")
+    months = df[partition_by].dt.strftime("%Y-%m").fillna(NULL_MONTH)
+
+    written = set()
+    for month, part in df.groupby(months, sort=False):
+        part_dir = directory / f"{MONTH}={month}"
+        part_dir.mkdir(exist_ok=True)
+        _write_atomic(part, part_dir / "data.parquet")
+        written.add(part_dir.name)
+
+    if replace:
+        for part_dir in directory.glob(f"{MONTH}=*"):
+            if part_dir.name not in written:
+                shutil.rmtree(part_dir)
+
+
+def main(argv=None):
+    from datasource import TABLES, DuckDBBackend, ExcelBackend
+
+    parser = argparse.ArgumentParser(description="Write the Parquet store.")
+    parser.add_argument(
+        "datasets",
+        nargs="*",
+        type=one_of(TABLES),
+        help=f"datasets to write ({', '.join(TABLES)}); none writes them all",
+    )
+    parser.add_argument(
+        "--from",
+        dest="source",
+        default="snowflake",
+        choices=["snowflake", "excel"],
+        help="backend the datasets are copied from",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="rewrite every month, not only the newest"
+    )
+    args = parser.parse_args(argv)
+
+    store = DuckDBBackend()
+    source = ExcelBackend() if args.source == "excel" else None
+    for name in args.datasets or TABLES:
+        store.refresh(name, full=args.full, source=source)
+        print(f"{name}: {store.dataset_dir(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+snapshot.py
+Local Parquet snapshots of Snowflake tables, refreshed from a high-water mark.
+
+Only rows dated on or after the newest stored date are fetched; that last day
+is fetched again because it may have been partial when it was first stored.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from snowflake.snowpark.functions import col
+
+
+def load_incremental(session, table, date_column, file, full=False):
+    """Return `table` from the snapshot `file`, topped up with the rows newer
+    than its high-water mark. `full=True` reloads the whole table."""
+    file = Path(file)
+
+    df = None if full or not file.exists() else pd.read_parquet(file)
+
+    if df is None or df.empty:
+        df = session.table(table).to_pandas()
+    else:
+        watermark = df[date_column].max()
+        _df_new = session.table(table).filter(col(date_column) >= watermark).to_pandas()
+        df = pd.concat(
+            [df.loc[df[date_column] < watermark], _df_new], ignore_index=True
+        )
+
+    file.parent.mkdir(parents=True, exist_ok=True)
+    # unique per write: every Streamlit session runs on a thread of one process
+    fd, tmp = tempfile.mkstemp(dir=file.parent, prefix=f"{file.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, file)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+    return df
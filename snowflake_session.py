@@ -0,0 +1,88 @@
+"""
+snowflake_session.py
+Small pool of long-lived Snowpark sessions shared by every page.
+
+    with pooled_session() as session:
+        df = session.sql("select ...").to_pandas()
+
+Sessions go back to the pool instead of being closed, so page loads skip the
+login handshake. A session idle for longer than HEALTH_CHECK_AFTER seconds is
+pinged before reuse and replaced when the ping fails; a session whose block
+raised is discarded.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+from snowflake.snowpark import Session
+
+POOL_SIZE = 4
+HEALTH_CHECK_AFTER = 300
+
+
+def connection_parameters():
+    return {
+        "user": st.secrets.connections.snowflake.user,
+        "password": st.secrets.connections.snowflake.password,
+        "account": st.secrets.connections.snowflake.account,
+        "role": st.secrets.connections.snowflake.role,
+        "warehouse": st.secrets.connections.snowflake.warehouse,
+        "database": st.secrets.connections.snowflake.database,
+        "schema": st.secrets.connections.snowflake.schema,
+        "client_session_keep_alive": st.secrets.connections.snowflake.get(
+            "client_session_keep_alive", True
+        ),
+    }
+
+
+def _close_quietly(session):
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+class SessionPool:
+    def __init__(self, size=POOL_SIZE):
+        self._idle = queue.LifoQueue()  # (session, last used)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _checkout(self):
+        try:
+            session, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return Session.builder.configs(connection_parameters()).create()
+
+        if time.monotonic() - last_used > HEALTH_CHECK_AFTER:
+            try:
+                session.sql("select 1").collect()
+            except Exception:
+                _close_quietly(session)
+                return Session.builder.configs(connection_parameters()).create()
+        return session
+
+    @contextmanager
+    def session(self):
+        with self._slots:
+            session = self._checkout()
+            try:
+                yield session
+            except BaseException:
+                # includes KeyboardInterrupt and Streamlit's rerun/stop, which
+                # can leave a query running on the session
+                _close_quietly(session)
+                raise
+            self._idle.put((session, time.monotonic()))
+
+
+@st.cache_resource
+def _pool():
+    return SessionPool(st.secrets.connections.snowflake.get("pool_size", POOL_SIZE))
+
+
+def pooled_session():
+    """Context manager lending a Snowpark session from the shared pool."""
+    return _pool().session()
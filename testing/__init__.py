@@ -0,0 +1,4 @@
+"""
+testing
+Support code shared by the tests (tests/) and the benchmarks (benchmarks/).
+"""
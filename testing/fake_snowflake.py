@@ -0,0 +1,635 @@
+"""
+fake_snowflake.py
+In-process stand-in for the part of Snowpark the app uses, backed by DuckDB,
+so the Snowflake code paths can be timed and checked without an account.
+
+    from testing import fake_snowflake
+    database = fake_snowflake.install(latency=0.05)   # before importing the app
+    database.load_tables({"SALES": df_sales, "EOD": df_eod})
+
+    import datasource   # now talks to DuckDB through the fake snowflake.snowpark
+
+`install` puts this module in sys.modules as snowflake.snowpark (and its
+functions as snowflake.snowpark.functions). The tables of SCHEMAS live in
+DB_MIS.PUBLIC, which is also the current schema, so qualified and bare names
+both resolve. A session's queries run one at a time on its own connection,
+so temporary tables last as long as the session. Every query sleeps `latency` seconds and every new session
+`connect_latency`, like round trips to the warehouse; `to_pandas(block=False)`
+runs queries on a thread pool so their latencies overlap as async jobs do.
+
+Supported: Session.builder.config(s)().create(), session.table/sql/close,
+session.file.put and `remove @stage` (stages are local directories);
+DataFrame select/filter/where/group_by().agg/distinct/sort/limit/
+to_pandas(block)/collect/count; col, lit, sum, min, max, count, avg, to_char;
+Column comparisons, &, |, ~, isin, is_null, is_not_null, equal_null, alias.
+SQL text goes to DuckDB as is, except number(p,s), timestamp_ntz,
+`insert overwrite` and `create table ... clone`, which are rewritten;
+equal_null is a macro.
+Results come back as Snowflake returns them: DATE columns as datetime.date.
+"""
+
+import glob
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+DATABASE = "DB_MIS"
+SCHEMA = "PUBLIC"
+
+SCHEMAS = {
+    "AZURECONSUMPTION": {
+        "USAGEDATE": "DATE",
+        "SUBSCRIPTION": "VARCHAR",
+        "CATEGORY": "VARCHAR",
+        "RESOURCEGROUP": "VARCHAR",
+        "COST": "DOUBLE",
+    },
+    "SALES": {
+        "EMPLOYEE": "VARCHAR",
+        "PROJECT": "VARCHAR",
+        "INIT_RATE": "DOUBLE",
+        "FTE": "DOUBLE",
+        "RATE": "DOUBLE",
+        "PERIOD": "DATE",
+        "RANK": "VARCHAR",
+        "LEVEL": "INTEGER",
+        "TARGET": "DOUBLE",
+        "BILLED": "DOUBLE",
+        "INDIV_ELIGIBILITY": "DOUBLE",
+    },
+    "HOLIDAY": {
+        "HOLIDAY": "DATE",
+        "HOLIDAY_NAME": "VARCHAR",
+    },
+    "INVOICE": {
+        "CLIENT": "VARCHAR",
+        "INV_DATE": "DATE",
+        "DUE_DATE": "DATE",
+        "INV_AMOUNT": "DOUBLE",
+        "CURRENCY": "VARCHAR",
+        "DATE_PAID": "DATE",
+        "PAYMENT_AMOUNT": "DOUBLE",
+        "TX_TYPE": "VARCHAR",
+        "INV_YR": "INTEGER",
+        "INV_MON": "INTEGER",
+        "PAYMENT_YR": "INTEGER",
+        "PAYMENT_MON": "INTEGER",
+    },
+    # column order matters: the Xamun page slices EMPLOYEE..ACCOUNT
+    "EMPLOYEE": {
+        "EMPLOYEE": "VARCHAR",
+        "GRP": "VARCHAR",
+        "RESIGNED": "BOOLEAN",
+        "LASTDAY": "DATE",
+        "RANK": "VARCHAR",
+        "LEVEL": "INTEGER",
+        "START_DATE": "DATE",
+        "ACCOUNT": "VARCHAR",
+        "GRP2": "VARCHAR",
+        "COMPANY": "VARCHAR",
+        "INCLUDE": "INTEGER",
+        "Remarks": "VARCHAR",
+        "XamunBilledProj": "VARCHAR",
+        "XamunActivities": "VARCHAR",
+    },
+    "EOD": {
+        "EMPLOYEE": "VARCHAR",
+        "DATE": "DATE",
+        "ACCOUNT": "VARCHAR",
+        "HOURS": "INTEGER",
+        "MINUTES": "INTEGER",
+    },
+}
+
+# Snowflake SQL the DuckDB parser doesn't take, and its DuckDB form
+_DIALECT = [
+    (re.compile(r"\bnumber\s*\(", re.I), "decimal("),
+    (re.compile(r"\btimestamp_ntz\b", re.I), "timestamp"),
+    (
+        re.compile(r"\binsert\s+overwrite\s+into\s+([\w.]+)", re.I),
+        r"delete from \1; insert into \1",
+    ),
+    (
+        re.compile(r"\bcreate\s+table\s+([\w.]+)\s+clone\s+([\w.]+)", re.I),
+        r"create table \1 as select * from \2",
+    ),
+]
+
+_database = None
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fake-snowflake")
+
+
+class Database:
+    def __init__(self, latency=0.0, connect_latency=0.0, stage_dir=None):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.stage_dir = Path(stage_dir or tempfile.mkdtemp(prefix="fake-stage-"))
+        self.queries = 0  # executed, for tests that count round trips
+        self._lock = threading.Lock()
+
+        self.connection = duckdb.connect()
+        self.connection.execute(f"attach ':memory:' as {DATABASE}")
+        self.connection.execute(f"create schema {DATABASE}.{SCHEMA}")
+        self.connection.execute(
+            f"create macro {DATABASE}.{SCHEMA}.equal_null(a, b)"
+            " as a is not distinct from b"
+        )
+        for table, columns in SCHEMAS.items():
+            self.create_table(table, columns)
+
+    def create_table(self, table, columns):
+        body = ", ".join(f'"{name}" {type_}' for name, type_ in columns.items())
+        self.connection.execute(
+            f"create or replace table {DATABASE}.{SCHEMA}.{table} ({body})"
+        )
+
+    def load_tables(self, frames, replace=True):
+        """Insert `{table: frame}`; columns are matched by name and cast to the
+        table's types, missing ones are left null."""
+        cursor = self.connection.cursor()
+        for table, df in frames.items():
+            if replace:
+                cursor.execute(f"delete from {DATABASE}.{SCHEMA}.{table}")
+            cursor.register("_frame", df)
+            cursor.execute(
+                f"insert into {DATABASE}.{SCHEMA}.{table} by name select * from _frame"
+            )
+            cursor.unregister("_frame")
+
+    def cursor(self):
+        cursor = self.connection.cursor()
+        cursor.execute(f"use {DATABASE}.{SCHEMA}")
+        return cursor
+
+    def execute(self, sql, session=None):
+        """Run `sql` after the injected latency; returns (columns, arrow table).
+        With a `session` it runs on that session's connection."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.queries += 1
+        for pattern, duckdb_sql in _DIALECT:
+            sql = pattern.sub(duckdb_sql, sql)
+        if session is None:
+            return self._run(self.cursor(), sql)
+        with session._lock:
+            return self._run(session._cursor(), sql)
+
+    def _run(self, cursor, sql):
+        cursor.execute(sql)
+        if cursor.description is None:
+            return [], None
+        fetch = getattr(cursor, "to_arrow_table", None) or cursor.fetch_arrow_table
+        return [d[0] for d in cursor.description], fetch()
+
+    def stage(self, name):
+        """Directory of the stage `@name` (or `@name/path`)."""
+        name = name.lstrip("@").rstrip("/").split("/", 1)[0]
+        directory = self.stage_dir / name.split(".")[-1].upper()
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+
+def database():
+    if _database is None:
+        raise RuntimeError("fake_snowflake.install() has not been called")
+    return _database
+
+
+# ----------------------------------------------------
+#       columns and functions
+# ----------------------------------------------------
+
+
+def _literal(value):
+    if isinstance(value, Column):
+        return value.sql
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return f"timestamp '{pd.Timestamp(value).isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"date '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _column(value):
+    return value if isinstance(value, Column) else col(value)
+
+
+class Column:
+    def __init__(self, sql, name=None):
+        self.sql = sql
+        self.name = name
+
+    def _op(self, op, other):
+        return Column(f"({self.sql} {op} {_literal(other)})")
+
+    def __eq__(self, other):
+        return self._op("=", other)
+
+    def __ne__(self, other):
+        return self._op("<>", other)
+
+    def __lt__(self, other):
+        return self._op("<", other)
+
+    def __le__(self, other):
+        return self._op("<=", other)
+
+    def __gt__(self, other):
+        return self._op(">", other)
+
+    def __ge__(self, other):
+        return self._op(">=", other)
+
+    def __and__(self, other):
+        return self._op("and", other)
+
+    def __or__(self, other):
+        return self._op("or", other)
+
+    def __invert__(self):
+        return Column(f"(not {self.sql})")
+
+    def __add__(self, other):
+        return self._op("+", other)
+
+    def __sub__(self, other):
+        return self._op("-", other)
+
+    def __mul__(self, other):
+        return self._op("*", other)
+
+    def __truediv__(self, other):
+        return self._op("/", other)
+
+    __hash__ = None
+
+    def isin(self, *values):
+        if len(values) == 1 and isinstance(values[0], (list, tuple, set, pd.Series)):
+            values = list(values[0])
+        if not values:
+            return Column("false")
+        return Column(f"({self.sql} in ({', '.join(_literal(v) for v in values)}))")
+
+    def is_null(self):
+        return Column(f"({self.sql} is null)")
+
+    def is_not_null(self):
+        return Column(f"({self.sql} is not null)")
+
+    def equal_null(self, other):
+        return Column(f"({self.sql} is not distinct from {_literal(other)})")
+
+    def alias(self, name):
+        return Column(self.sql, name)
+
+    as_ = alias
+
+    def asc(self):
+        return Column(f"{self.sql} asc")
+
+    def desc(self):
+        return Column(f"{self.sql} desc")
+
+    def _select(self):
+        return self.sql if self.name is None else f'{self.sql} as "{self.name}"'
+
+
+def col(name):
+    return Column(f'"{name}"', None)
+
+
+def lit(value):
+    return Column(_literal(value))
+
+
+def _function(name):
+    def function(column):
+        return Column(f"{name}({_column(column).sql})")
+
+    function.__name__ = name
+    return function
+
+
+sum_ = _function("sum")
+min_ = _function("min")
+max_ = _function("max")
+avg = _function("avg")
+
+
+def count(column="*"):
+    return Column("count(*)" if column == "*" else f"count({_column(column).sql})")
+
+
+# Snowflake format elements, longest first
+_FORMATS = [("YYYY", "%Y"), ("HH24", "%H"), ("MON", "%b"), ("MM", "%m"),
+            ("DD", "%d"), ("MI", "%M"), ("SS", "%S"), ("YY", "%y")]
+
+
+def to_char(column, format=None):
+    column = _column(column)
+    if format is None:
+        return Column(f"cast({column.sql} as varchar)")
+    for snowflake, strftime in _FORMATS:
+        format = format.replace(snowflake, strftime)
+    return Column(f"strftime({column.sql}, {_literal(format)})")
+
+
+# ----------------------------------------------------
+#       dataframes
+# ----------------------------------------------------
+
+
+def _to_pandas(table):
+    # DATE as datetime.date, as the Snowflake connector returns it
+    return table.to_pandas(date_as_object=True)
+
+
+class AsyncJob:
+    def __init__(self, future):
+        self._future = future
+
+    def result(self):
+        return self._future.result()
+
+    def is_done(self):
+        return self._future.done()
+
+    def cancel(self):
+        return self._future.cancel()
+
+
+class DataFrame:
+    def __init__(self, session, sql):
+        self.session = session
+        self.sql = sql
+
+    def _derive(self, sql):
+        return DataFrame(self.session, sql)
+
+    def select(self, *columns):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        exprs = ", ".join(_column(c)._select() for c in columns)
+        return self._derive(f"select {exprs} from ({self.sql})")
+
+    def filter(self, condition):
+        return self._derive(f"select * from ({self.sql}) where {condition.sql}")
+
+    where = filter
+
+    def group_by(self, *columns):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        return GroupedData(self, [_column(c) for c in columns])
+
+    groupBy = group_by
+
+    def distinct(self):
+        return self._derive(f"select distinct * from ({self.sql})")
+
+    def sort(self, *columns, ascending=True):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(columns)
+        keys = ", ".join(
+            _column(c).sql + ("" if asc else " desc")
+            for c, asc in zip(columns, ascending)
+        )
+        return self._derive(f"select * from ({self.sql}) order by {keys}")
+
+    order_by = orderBy = sort
+
+    def limit(self, n):
+        return self._derive(f"select * from ({self.sql}) limit {int(n)}")
+
+    def _fetch(self):
+        _, table = database().execute(self.sql, self.session)
+        return _to_pandas(table)
+
+    def to_pandas(self, block=True):
+        if block:
+            return self._fetch()
+        return AsyncJob(_pool.submit(self._fetch))
+
+    def collect(self, block=True):
+        def rows():
+            columns, table = database().execute(self.sql, self.session)
+            if table is None:
+                return []
+            Row = namedtuple("Row", columns, rename=True)
+            return [Row(*values) for values in zip(*table.to_pydict().values())]
+
+        return rows() if block else AsyncJob(_pool.submit(rows))
+
+    def count(self):
+        return self._derive(f"select count(*) from ({self.sql})").collect()[0][0]
+
+
+class GroupedData:
+    def __init__(self, df, keys):
+        self.df = df
+        self.keys = keys
+
+    def agg(self, *exprs):
+        if len(exprs) == 1 and isinstance(exprs[0], (list, tuple)):
+            exprs = exprs[0]
+        keys = ", ".join(k.sql for k in self.keys)
+        select = ", ".join([k._select() for k in self.keys] + [e._select() for e in exprs])
+        group = f" group by {keys}" if keys else ""
+        return self.df._derive(f"select {select} from ({self.df.sql}){group}")
+
+
+# ----------------------------------------------------
+#       stages
+# ----------------------------------------------------
+
+PutResult = namedtuple(
+    "PutResult",
+    "source target source_size target_size source_compression "
+    "target_compression status message",
+)
+
+_REMOVE = re.compile(
+    r"^\s*(?:remove|rm)\s+(@\S+)(?:\s+pattern\s*=\s*'([^']*)')?\s*;?\s*$", re.I
+)
+
+
+class _StageCommand:
+    """`remove @stage [pattern='regex']`; stages are not SQL in DuckDB."""
+
+    def __init__(self, stage, pattern):
+        self.stage = stage
+        self.pattern = pattern
+
+    def collect(self):
+        database().execute("select 1")  # one round trip, like the real command
+        Row = namedtuple("Row", "name result")
+        rows = []
+        for file in sorted(database().stage(self.stage).iterdir()):
+            if self.pattern is None or re.fullmatch(self.pattern, file.name):
+                file.unlink()
+                rows.append(Row(file.name, "removed"))
+        return rows
+
+    def to_pandas(self, block=True):
+        return pd.DataFrame(self.collect(), columns=["name", "result"])
+
+
+class FileOperation:
+    def put(self, local_file_name, stage_location, parallel=4, auto_compress=True,
+            source_compression="AUTO_DETECT", overwrite=False):
+        database().execute("select 1")
+        target_dir = database().stage(stage_location)
+        results = []
+        for source in sorted(glob.glob(str(local_file_name))):
+            source = Path(source)
+            compress = auto_compress and not source.name.endswith(".gz")
+            target = target_dir / (source.name + (".gz" if compress else ""))
+            if target.exists() and not overwrite:
+                status = "SKIPPED"
+            else:
+                shutil.copyfile(source, target)
+                status = "UPLOADED"
+            compression = "GZIP" if source.name.endswith(".gz") else "NONE"
+            results.append(
+                PutResult(
+                    source.name,
+                    target.name,
+                    source.stat().st_size,
+                    target.stat().st_size,
+                    compression,
+                    "GZIP" if compress else compression,
+                    status,
+                    "",
+                )
+            )
+        return results
+
+
+# ----------------------------------------------------
+#       session
+# ----------------------------------------------------
+
+
+class _Builder:
+    def __get__(self, obj, owner):
+        # a fresh builder per access, as Snowpark's
+        return Session.SessionBuilder()
+
+
+class Session:
+    builder = _Builder()
+
+    class SessionBuilder:
+        def __init__(self):
+            self._options = {}
+
+        def config(self, key, value):
+            self._options[key] = value
+            return self
+
+        def configs(self, options):
+            self._options.update(options)
+            return self
+
+        def create(self):
+            db = database()
+            if db.connect_latency:
+                time.sleep(db.connect_latency)
+            return Session(self._options)
+
+        getOrCreate = create
+
+    def __init__(self, options=None):
+        self.options = dict(options or {})
+        self.file = FileOperation()
+        self.closed = False
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _cursor(self):
+        # the session's own connection: temporary tables live as long as it
+        if self._connection is None:
+            self._connection = database().cursor()
+        return self._connection
+
+    def table(self, name):
+        if isinstance(name, (list, tuple)):
+            name = ".".join(name)
+        return DataFrame(self, f"select * from {name}")
+
+    def sql(self, query):
+        remove = _REMOVE.match(query)
+        if remove:
+            return _StageCommand(*remove.groups())
+        return DataFrame(self, query)
+
+    def create_dataframe(self, data, schema=None):
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data, columns=schema)
+        rows = ", ".join(
+            "(" + ", ".join(_literal(v) for v in row) + ")"
+            for row in df.itertuples(index=False)
+        )
+        names = ", ".join(f'"{c}"' for c in df.columns)
+        return DataFrame(self, f"select * from (values {rows}) as t({names})")
+
+    def close(self):
+        self.closed = True
+        if self._connection is not None:
+            self._connection.close()
+
+
+def install(latency=0.0, connect_latency=0.0, stage_dir=None):
+    """Serve snowflake.snowpark from this module; returns the fresh Database."""
+    global _database
+    _database = Database(latency, connect_latency, stage_dir)
+
+    functions = types.ModuleType("snowflake.snowpark.functions")
+    functions.col = functions.column = col
+    functions.lit = lit
+    functions.sum = sum_
+    functions.min = min_
+    functions.max = max_
+    functions.avg = avg
+    functions.count = count
+    functions.to_char = to_char
+
+    snowpark = types.ModuleType("snowflake.snowpark")
+    snowpark.Session = Session
+    snowpark.DataFrame = DataFrame
+    snowpark.Column = Column
+    snowpark.AsyncJob = AsyncJob
+    snowpark.functions = functions
+
+    snowflake = sys.modules.get("snowflake") or types.ModuleType("snowflake")
+    snowflake.snowpark = snowpark
+    sys.modules.update(
+        {
+            "snowflake": snowflake,
+            "snowflake.snowpark": snowpark,
+            "snowflake.snowpark.functions": functions,
+        }
+    )
+    return _database
@@ -0,0 +1,44 @@
+from functools import partial
+
+import pytest
+
+from testing import fake_snowflake
+
+# before anything imports snowflake.snowpark; tests get the DuckDB stand-in
+fake_snowflake.install()
+
+
+class Calls(list):
+    """Calls to stubbed functions, as (name, args, kwargs)."""
+
+    def __init__(self, monkeypatch):
+        super().__init__()
+        self._monkeypatch = monkeypatch
+
+    def stub(self, owner, *names):
+        """Replace each `owner.<name>` with a recorder; returns the list."""
+        for name in names:
+            self._monkeypatch.setattr(owner, name, partial(self._record, name))
+        return self
+
+    def _record(self, name, *args, **kwargs):
+        self.append((name, args, kwargs))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    return Calls(monkeypatch)
+
+
+@pytest.fixture
+def usage_error(capsys):
+    """Run a script's `main(argv)`, which must stop with a usage error;
+    returns the message."""
+
+    def usage_error(main, argv):
+        with pytest.raises(SystemExit) as exc:
+            main(argv)
+        assert exc.value.code == 2
+        return capsys.readouterr().err
+
+    return usage_error
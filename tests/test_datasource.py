@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date
+
+import pandas as pd
+
+import datasource
+from snapshot import load_incremental
+from testing import fake_snowflake
+
+HOLIDAYS = pd.DataFrame(
+    {"HOLIDAY": pd.to_datetime(["2024-06-12", "2024-12-25"]), "HOLIDAY_NAME": ["A", "B"]}
+)
+
+AZURE = pd.DataFrame(
+    {
+        "USAGEDATE": [date(2024, 7, 1), date(2024, 7, 1), date(2024, 7, 2)],
+        "SUBSCRIPTION": ["Beta", "Production", "Beta"],
+        "CATEGORY": "Storage",
+        "RESOURCEGROUP": "rg-1",
+        "COST": [1.0, 4.0, 2.0],
+    }
+)
+
+
+def test_parquet_refreshes_a_missing_snapshot(monkeypatch, tmp_path):
+    refreshed = []
+
+    def refresh(self, name, full=False):
+        refreshed.append(name)
+        HOLIDAYS.to_parquet(datasource.snapshot_file(name, self.path))
+
+    monkeypatch.setattr(datasource.ParquetBackend, "refresh", refresh)
+    source = datasource.ParquetBackend(tmp_path)
+
+    df = source.load("holidays", where=[("HOLIDAY", ">", date(2024, 7, 1))])
+    source.load("holidays")
+
+    assert df.HOLIDAY_NAME.tolist() == ["B"]
+    assert refreshed == ["holidays"]
+
+
+def test_excel_keeps_frames_until_the_workbook_changes(monkeypatch, tmp_path):
+    workbook, reads = tmp_path / "Billing v3.0.xlsx", []
+    workbook.touch()
+
+    def read():
+        reads.append(1)
+        return HOLIDAYS
+
+    monkeypatch.setitem(datasource.EXCEL_WORKBOOKS, "holidays", lambda: [workbook])
+    monkeypatch.setitem(datasource.EXCEL_READERS, "holidays", read)
+    source = datasource.ExcelBackend()
+
+    source.load("holidays")
+    df = source.load("holidays", ["HOLIDAY_NAME"])
+    assert len(reads) == 1
+    assert df.HOLIDAY_NAME.tolist() == ["A", "B"]
+
+    os.utime(workbook, ns=(1, 1))
+    source.load("holidays")
+    assert len(reads) == 2
+
+
+def test_load_many_runs_side_by_side():
+    barrier = threading.Barrier(3, timeout=5)
+
+    class Backend(datasource.Backend):
+        def load(self, name, columns=None, where=()):
+            barrier.wait()  # breaks unless all three loads run at once
+            return name
+
+    assert Backend().load_many(
+        [("sales", None, ()), ("holidays", None, ()), ("invoices", None, ())]
+    ) == ["sales", "holidays", "invoices"]
+
+
+def test_refresh_then_aggregate_is_one_round_trip(monkeypatch, tmp_path):
+    database = fake_snowflake.install()
+    database.load_tables({"AZURECONSUMPTION": AZURE})
+    session = fake_snowflake.Session.builder.create()
+    monkeypatch.setattr(datasource, "pooled_session", lambda: nullcontext(session))
+    monkeypatch.setattr(datasource, "snapshot_path", lambda: tmp_path)
+    source = datasource.SnowflakeBackend()
+
+    queries = database.queries
+    source.refresh("azure_usage")
+    df = source.aggregate("azure_usage", ["SUBSCRIPTION"], "COST")
+    assert database.queries == queries + 1
+    assert df.COST.tolist() == [3.0, 4.0]
+
+    # later loads top the snapshot up again
+    source.load("azure_usage")
+    assert database.queries == queries + 2
+
+
+def test_snapshot_writes_from_threads(tmp_path):
+    class Session:
+        def table(self, name):
+            return self
+
+        def to_pandas(self):
+            return AZURE
+
+    file = tmp_path / "AZURECONSUMPTION.parquet"
+    with ThreadPoolExecutor(8) as pool:
+        jobs = [
+            pool.submit(load_incremental, Session(), "T", "USAGEDATE", file, full=True)
+            for _ in range(32)
+        ]
+        for job in jobs:
+            job.result()
+    pd.testing.assert_frame_equal(pd.read_parquet(file), AZURE)
+    assert list(tmp_path.iterdir()) == [file]
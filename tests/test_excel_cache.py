@@ -0,0 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from excel_cache import _store
+
+
+def test_store_from_threads(tmp_path):
+    # the pages read the billing sheets on threads of one process
+    df = pd.DataFrame({"a": range(50_000), "b": ["x"] * 50_000})
+    sidecar = tmp_path / "book.xlsx.0.1.parquet"
+    with ThreadPoolExecutor(8) as pool:
+        for job in [pool.submit(_store, df, sidecar, "book.xlsx.0") for _ in range(32)]:
+            job.result()
+    pd.testing.assert_frame_equal(pd.read_parquet(sidecar), df)
+    assert list(tmp_path.iterdir()) == [sidecar]
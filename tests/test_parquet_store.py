@@ -0,0 +1,27 @@
+import pytest
+
+import datasource
+import parquet_store
+
+
+@pytest.fixture
+def refreshed(monkeypatch, calls):
+    monkeypatch.setattr(datasource, "store_path", lambda: "store")
+    return calls.stub(datasource.DuckDBBackend, "refresh")
+
+
+@pytest.mark.parametrize(
+    "argv, expected",
+    [
+        ([], [(name, False) for name in datasource.TABLES]),
+        (["--full", "eod", "sales"], [("eod", True), ("sales", True)]),
+    ],
+)
+def test_main(refreshed, argv, expected):
+    parquet_store.main(argv)
+    assert [(args[0], kwargs["full"]) for _, args, kwargs in refreshed] == expected
+
+
+def test_main_rejects_unknown_datasets(refreshed, usage_error):
+    assert "unknown 'payroll'" in usage_error(parquet_store.main, ["eod", "payroll"])
+    assert refreshed == []
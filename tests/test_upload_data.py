@@ -0,0 +1,55 @@
+from contextlib import nullcontext
+
+import pytest
+
+import upload_data
+
+
+@pytest.fixture
+def runs(calls):
+    return calls.stub(upload_data, "run_batch", "run_menu", "run_collapse")
+
+
+@pytest.mark.parametrize(
+    "argv, expected",
+    [
+        ([], ("run_menu", ())),
+        (["--all"], ("run_batch", (sorted(upload_data.FILE_NAME),))),
+        (["t", "a"], ("run_batch", (["T", "A"],))),
+        (["--collapse"], ("run_collapse", (["A", "T"],))),
+        (["--collapse", "t"], ("run_collapse", (["T"],))),
+    ],
+)
+def test_main(runs, argv, expected):
+    upload_data.main(argv)
+    assert [(name, args[:1]) for name, args, _ in runs] == [expected]
+
+
+def test_main_rejects_unknown_sources(runs, usage_error):
+    assert "unknown 'Q'" in usage_error(upload_data.main, ["t", "q"])
+    assert runs == []
+
+
+def test_collapse_only_merged_sources(runs, usage_error):
+    assert "--collapse: C not merged" in usage_error(
+        upload_data.main, ["--collapse", "t", "c"]
+    )
+    assert runs == []
+
+
+def test_no_merge_leaves_the_merge_to_do(monkeypatch, calls, tmp_path):
+    monkeypatch.setattr(upload_data, "file_hash", lambda file: "digest")
+    monkeypatch.setattr(upload_data, "pooled_session", nullcontext)
+    uploads = calls.stub(upload_data, "convert_source", "put_source")
+
+    def run(merge):
+        uploads.clear()
+        upload_data.run_batch(
+            ["C", "T"], state_file=tmp_path / "state.json", workers=1, merge=merge
+        )
+        return sorted(args[1] for name, args, _ in uploads if name == "put_source")
+
+    assert run(merge=False) == ["C", "T"]
+    assert run(merge=True) == ["T"]  # PUT, but never merged
+    assert run(merge=True) == []
+    assert run(merge=False) == []
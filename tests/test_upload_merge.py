@@ -0,0 +1,153 @@
+from contextlib import nullcontext
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import upload_data
+from testing import fake_snowflake
+
+D1, D2 = date(2024, 7, 1), date(2024, 7, 2)
+
+# the full-replace upload left one row per EOD line: several per key
+OLD_EOD = pd.DataFrame(
+    {
+        "EMPLOYEE": ["Ann", "Ann", "Bob", None, None],
+        "DATE": [D1, D1, D1, D1, D1],
+        "ACCOUNT": ["Xamun", "Xamun", "Xamun", "Xamun", "Xamun"],
+        "HOURS": [2, 3, 8, 1, 1],
+        "MINUTES": [0, 30, 0, 0, 0],
+    }
+)
+STAGED_EOD = pd.DataFrame(
+    {
+        "EmployeeName": ["Ann", "Ann", "Cy"],
+        "Date": ["2024-07-01", "2024-07-01", "2024-07-02"],
+        "Account": ["Xamun", "Xamun", "Xamun"],
+        "Hours": [4, 2, 6],
+        "Minutes": [0, 0, 15],
+    }
+)
+
+
+@pytest.fixture
+def database():
+    return fake_snowflake.install()
+
+
+@pytest.fixture
+def session(database):
+    return fake_snowflake.Session.builder.create()
+
+
+def target(session, which_one, table=None):
+    keys = upload_data.MERGE_INTO[which_one][2]
+    return (
+        session.table(table or upload_data.MERGE_INTO[which_one][0])
+        .to_pandas()
+        .sort_values(keys, na_position="last", ignore_index=True)
+    )
+
+
+def stage(session, which_one, staged):
+    """upload's statements up to the merge, with the staged rows inserted in
+    place of the COPY from the stage."""
+    create, _copy, _merge_into = upload_data.merge_sql(which_one)
+    session.sql(create).collect()
+    staging = upload_data.MERGE_INTO[which_one][0].split(".")[-1] + "_STAGING"
+    session._cursor().register("staged", staged)
+    session.sql(f"insert into {staging} by name select * from staged").collect()
+
+
+def merge(session, which_one, staged):
+    """Returns the number of rows the merge wrote."""
+    stage(session, which_one, staged)
+    assert session.sql(upload_data.duplicates_sql(which_one)).collect()[0][0] == 0
+    return session.sql(upload_data.merge_sql(which_one)[-1]).collect()[0][0]
+
+
+def collapse(monkeypatch, session, sources, answer):
+    monkeypatch.setattr(upload_data, "pooled_session", lambda: nullcontext(session))
+    monkeypatch.setattr("builtins.input", lambda prompt: answer)
+    upload_data.run_collapse(sources)
+
+
+def backups(database, table):
+    return [
+        name
+        for (name,) in database.cursor()
+        .execute(
+            "select table_name from information_schema.tables"
+            f" where table_name like '{table}_BACKUP_%'"
+        )
+        .fetchall()
+    ]
+
+
+def test_merge_stops_on_rows_of_the_old_upload(database, session):
+    database.load_tables({"EOD": OLD_EOD})
+    stage(session, "T", STAGED_EOD)
+    # Ann has two rows; merging would set both to her new total
+    assert session.sql(upload_data.duplicates_sql("T")).collect()[0][0] == 1
+
+
+def test_collapse_asks_first(monkeypatch, database, session):
+    database.load_tables({"EOD": OLD_EOD})
+    collapse(monkeypatch, session, ["T"], "")
+
+    assert len(target(session, "T")) == 5
+    assert backups(database, "EOD") == []
+
+
+def test_merge_eod_after_collapse(monkeypatch, database, session):
+    database.load_tables({"EOD": OLD_EOD})
+    old = target(session, "T")
+    collapse(monkeypatch, session, ["T"], "y")
+
+    # the clone keeps every row of the old upload
+    (backup,) = backups(database, "EOD")
+    pd.testing.assert_frame_equal(target(session, "T", backup), old)
+
+    assert merge(session, "T", STAGED_EOD) == 2
+
+    df = target(session, "T")
+    assert df.EMPLOYEE.tolist() == ["Ann", "Bob", "Cy", None]
+    assert df.HOURS.tolist() == [6, 8, 6, 2]
+    assert df.MINUTES.tolist() == [0, 0, 15, 0]
+    assert df.DATE.tolist() == [D1, D1, D2, D1]
+
+    # the same upload again changes nothing
+    assert merge(session, "T", STAGED_EOD) == 0
+    pd.testing.assert_frame_equal(target(session, "T"), df)
+
+
+def test_merge_azure_at_the_resource_group_grain(database, session):
+    database.load_tables(
+        {
+            "AZURECONSUMPTION": pd.DataFrame(
+                {
+                    "USAGEDATE": [D1, D1],
+                    "SUBSCRIPTION": ["Beta", "Production"],
+                    "RESOURCEGROUP": ["rg-1", "rg-1"],
+                    "CATEGORY": ["Storage", "Storage"],
+                    "COST": [4.0, 7.0],
+                }
+            )
+        }
+    )
+    # one line per resource; the table keeps their sum per resource group
+    staged = pd.DataFrame(
+        {
+            "UsageDate": ["2024-07-01 00:00:00"] * 3,
+            "Subscription": ["Beta", "Beta", "Production"],
+            "Resource Group": ["rg-1", "rg-1", "rg-1"],
+            "Category": ["Storage", "Storage", "Storage"],
+            "Cost": [1.5, 3.5, 7.0],
+        }
+    )
+
+    assert merge(session, "A", staged) == 1
+
+    df = target(session, "A")
+    assert df.SUBSCRIPTION.tolist() == ["Beta", "Production"]
+    assert df.COST.tolist() == [5.0, 7.0]
@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+from usage_csv import aggregate_exports, list_exports
+
+KEYS = ["Date", "ServiceName"]
+
+
+def export(path, dates, cost, mtime):
+    pd.DataFrame(
+        {"Date": dates, "ServiceName": "Storage", "Cost": cost, "Other": "x"}
+    ).to_csv(path, index=False)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_overlapping_exports(tmp_path):
+    # a range export left next to the monthly one it overlaps
+    export(tmp_path / "range.csv", ["2024-06-30", "2024-07-01", "2024-07-02"], 1.0, 10**18)
+    export(tmp_path / "2024-07.csv", ["2024-07-01", "2024-07-02", "2024-07-03"], 2.0, 2 * 10**18)
+
+    df = aggregate_exports(list_exports(tmp_path), KEYS, max_workers=1)
+
+    assert df.Date.dt.strftime("%m-%d").tolist() == ["06-30", "07-01", "07-02", "07-03"]
+    assert df.Cost.tolist() == [1.0, 2.0, 2.0, 2.0]
+
+    # the newer export wins from the per-file cache too
+    os.utime(tmp_path / "range.csv", ns=(3 * 10**18, 3 * 10**18))
+    df = aggregate_exports(list_exports(tmp_path), KEYS, max_workers=1)
+    assert df.Cost.tolist() == [1.0, 1.0, 1.0, 2.0]
@@ -0,0 +1,45 @@
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from xlsx_to_csv import convert
+
+
+def workbook(path, rows, dimension=None):
+    book = Workbook()
+    for row in rows:
+        book.active.append(row)
+    book.save(path)
+    if dimension:
+        # as written by tools that don't update it
+        with zipfile.ZipFile(path) as z:
+            files = {name: z.read(name) for name in z.namelist()}
+        sheet = "xl/worksheets/sheet1.xml"
+        files[sheet] = re.sub(
+            rb'<dimension ref="[^"]*"', f'<dimension ref="{dimension}"'.encode(), files[sheet]
+        )
+        with zipfile.ZipFile(path, "w") as z:
+            for name, data in files.items():
+                z.writestr(name, data)
+    return path
+
+
+def test_stale_dimension(tmp_path):
+    rows = [["Date", "Cost", "Note"]] + [[f"2024-07-{d:02}", d, "x"] for d in range(1, 11)]
+    xlsx = workbook(tmp_path / "book.xlsx", rows, dimension="A1:B2")
+
+    (csv_file,) = convert(xlsx, "Sheet", tmp_path / "book.csv")
+
+    df = pd.read_csv(csv_file)
+    assert df.columns.tolist() == ["Date", "Cost", "Note"]
+    assert df.Cost.tolist() == list(range(1, 11))
+
+
+@pytest.mark.parametrize("rows", [[], [["title"], ["subtitle"]]])
+def test_no_header_row(tmp_path, rows):
+    xlsx = workbook(tmp_path / "book.xlsx", rows)
+    with pytest.raises(ValueError, match="no header row in Sheet"):
+        convert(xlsx, "Sheet", tmp_path / "book.csv", skiprows=2)
@@ -1,32 +1,89 @@
+"""
+upload_data.py
+Converts the source workbooks to CSV and PUTs them to their Snowflake stages.
+
+    python upload_data.py              # interactive menu
+    python upload_data.py --all        # every source
+    python upload_data.py E H R        # the chosen sources
+    python upload_data.py --all --force
+    python upload_data.py --collapse   # once: EOD and Azure to one row per key
+
+Batch runs share one session and skip a source whose workbook content is
+unchanged since its last upload (sha1 kept in UPLOAD_STATE); --force uploads
+regardless. The sha1 is kept per mode, so a --no-merge run doesn't stop a
+later run from merging the same workbook.
+
+Each source is written as gzip CSV chunks of CHUNK_ROWS rows (<name>_000.csv.gz,
+...), which replace the source's previous files on its stage; all but the
+billing sheets are streamed (xlsx_to_csv.py). A batch converts up to `workers`
+sources at a time in worker processes (the conversion is CPU-bound) and PUTs
+each as soon as it is converted, up to `workers` at a time on threads; the
+chunks go up in one PUT with `parallel` threads.
+
+Sources in MERGE_INTO (EOD, Azure) are then copied from the stage into a
+temporary table and merged into their table on the natural keys, so only new
+or changed rows are written (--no-merge skips this). The table must hold one
+row per key; a merge stops on a table filled by the old full-replace upload,
+which --collapse rebuilds at that grain after asking, keeping a clone of it.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
 import pandas as pd
-from snowflake.snowpark import Session
 # import snowflake.snowpark as snowpark
 # from snowflake.snowpark.functions import col
 import streamlit as st
+from pathlib import Path
 
+from billing import BILLING_WORKBOOK, read_billing
+from cli import one_of
+from snowflake_session import pooled_session
+from xlsx_to_csv import chunk_file, convert
 
-def from_xlsx_to_csv(**kwargs):
-    df = pd.read_excel(
-        xlsx_file,
-        sheet_name=sheet_name,
-        skiprows=kwargs.get("skiprows", 0),
-        usecols=kwargs.get("usecols", None),
-        date_format=kwargs.get("date_format", None),
-        engine="openpyxl",
-    )
-    df.to_csv(stage_file, index=False, sep=kwargs.get("sep", ","))
-    return None
+UPLOAD_STATE = Path(__file__).with_name(".upload_state.json")
+CHUNK_ROWS = 250_000
+PARALLEL = 4  # PUT threads per source
+WORKERS = 3  # sources uploaded at a time
 
 
-CONNECTION_PARAMS = {
-    "user": st.secrets.connections.snowflake.user,
-    "password": st.secrets.connections.snowflake.password,
-    "account": st.secrets.connections.snowflake.account,
-    "role": st.secrets.connections.snowflake.role,
-    "warehouse": st.secrets.connections.snowflake.warehouse,
-    "database": st.secrets.connections.snowflake.database,
-    "schema": st.secrets.connections.snowflake.schema,
-}
+def from_xlsx_to_csv(xlsx_file, sheet_name, stage_file, **kwargs):
+    # gzip CSV chunks, each with the header; old chunks of the file go first
+    stage_file = Path(stage_file)
+    for old in stage_file.parent.glob(f"{stage_file.stem}_*.csv.gz"):
+        old.unlink()
+
+    if Path(xlsx_file).name != BILLING_WORKBOOK:
+        # streamed row by row; memory stays flat for the EOD and Azure sheets
+        convert(
+            xlsx_file,
+            sheet_name,
+            stage_file,
+            skiprows=kwargs.get("skiprows", 0),
+            usecols=kwargs.get("usecols", None),
+            sep=kwargs.get("sep", ","),
+            date_format=kwargs.get("date_format", None),
+            chunk_rows=CHUNK_ROWS,
+            compression="gzip",
+        )
+        return None
+
+    # E, H and R share one parse of the workbook (see billing.py)
+    df = read_billing(xlsx_file)[sheet_name]
+    if kwargs.get("usecols"):
+        df = df[kwargs["usecols"]]
+    for i, start in enumerate(range(0, max(len(df), 1), CHUNK_ROWS)):
+        df.iloc[start : start + CHUNK_ROWS].to_csv(
+            chunk_file(stage_file, i, "gzip"),
+            index=False,
+            sep=kwargs.get("sep", ","),
+            compression="gzip",
+        )
+    return None
 
 
 MENU_ITEMS: str = "".join(
@@ -82,47 +139,379 @@ FILE_NAME = {
 }
 
 
-while True:
-    which_one = input(MENU_ITEMS).upper()
+# per source: options for from_xlsx_to_csv
+READ_OPTIONS = {
+    "A": dict(skiprows=2, date_format={"UsageDate": "%Y-%m-%d %H:%M:%S"}),  # azure
+    "C": dict(sep="|"),  # Collections/Invoice
+    "E": dict(),  # employee
+    "H": dict(),  # holiday
+    "R": dict(  # RateCard/Sales
+        skiprows=1,
+        usecols=[
+            "Employee",
+            "Project",
+            "InitRate",
+            "FTE",
+            "Period",
+            "Rank",
+            "Level",
+            "Target2",
+            "Billed",
+            "ind_eligibility",
+        ],
+    ),
+    "T": dict(usecols=["EmployeeName", "Date", "Account", "Hours", "Minutes"]),  # EOD
+}
 
-    if which_one == "X":
-        print("Exited.")
-        break
 
-    xlsx_file, sheet_name, stage_file, stage_name = FILE_NAME[which_one]
+# sources merged into their table after the PUT:
+# (table, {csv header: (column, type)}, natural key columns)
+# the staged rows are summed per key, so the table holds one row per key.
+# Azure: the table has no resource column, so a key (and a row) covers every
+# resource of a resource group and category on a day. Tables filled by the
+# old full-replace upload hold several rows per key; they are not merged into
+# until --collapse has rebuilt them at this grain (see collapse_sql).
+MERGE_INTO = {
+    "T": (
+        "DB_MIS.PUBLIC.EOD",
+        {
+            "EmployeeName": ("EMPLOYEE", "varchar"),
+            "Date": ("DATE", "date"),
+            "Account": ("ACCOUNT", "varchar"),
+            "Hours": ("HOURS", "number(38,2)"),
+            "Minutes": ("MINUTES", "number(38,2)"),
+        },
+        ["EMPLOYEE", "DATE", "ACCOUNT"],
+    ),
+    "A": (
+        "DB_MIS.PUBLIC.AZURECONSUMPTION",
+        {
+            "UsageDate": ("USAGEDATE", "date"),
+            "Subscription": ("SUBSCRIPTION", "varchar"),
+            "Resource Group": ("RESOURCEGROUP", "varchar"),
+            "Category": ("CATEGORY", "varchar"),
+            "Cost": ("COST", "float"),
+        },
+        ["USAGEDATE", "SUBSCRIPTION", "RESOURCEGROUP", "CATEGORY"],
+    ),
+}
 
-    session = Session.builder.configs(CONNECTION_PARAMS).create()
 
-    if which_one == "A":  # azure
-        from_xlsx_to_csv(skiprows=2, date_format={"UsageDate": "%Y-%m-%d %H:%M:%S"})
-    elif which_one == "T":  # EOD
-        from_xlsx_to_csv(
-            usecols=["EmployeeName", "Date", "Account", "Hours", "Minutes"]
-        )
-    elif which_one == "C":  # Collections/Invoice
-        from_xlsx_to_csv(sep="|")
-    elif which_one == "R":  # RateCard/Sales
-        from_xlsx_to_csv(
-            skiprows=1,
-            usecols=[
-                "Employee",
-                "Project",
-                "InitRate",
-                "FTE",
-                "Period",
-                "Rank",
-                "Level",
-                "Target2",
-                "Billed",
-                "ind_eligibility",
-            ],
+def _merged_rows(which_one):
+    # the staged rows, one per key, with the table's column names and types
+    table, columns, keys = MERGE_INTO[which_one]
+    select = ", ".join(
+        f'"{header}"::{type_} as {column}'
+        if column in keys
+        else f'sum("{header}"::{type_}) as {column}'
+        for header, (column, type_) in columns.items()
+    )
+    return (
+        f"select {select} from {table.split('.')[-1]}_STAGING"
+        f" group by {', '.join(str(i + 1) for i in range(len(keys)))}"
+    )
+
+
+def merge_sql(which_one):
+    """Statements loading the staged chunks of `which_one` into a temporary
+    table and merging them into its target on the natural keys; only new keys
+    are inserted and only rows whose values changed are updated."""
+    table, columns, keys = MERGE_INTO[which_one]
+    stage_file, stage_name = FILE_NAME[which_one][2:]
+    staging = f"{table.split('.')[-1]}_STAGING"  # temporary, in the session's schema
+    sep = READ_OPTIONS[which_one].get("sep", ",")
+
+    # dates arrive as "YYYY-MM-DD[ HH:MM:SS]"; staged as timestamps, merged as dates
+    staging_columns = ", ".join(
+        f'"{header}" {"timestamp_ntz" if type_ == "date" else type_}'
+        for header, (_, type_) in columns.items()
+    )
+    values = [column for column, _ in columns.values() if column not in keys]
+    all_columns = [column for column, _ in columns.values()]
+
+    return [
+        f"create or replace temporary table {staging} ({staging_columns})",
+        f"copy into {staging} from {stage_name}"
+        f" pattern='.*{Path(stage_file).stem}_[0-9]+[.]csv[.]gz'"
+        f" file_format=(type=csv parse_header=true field_delimiter='{sep}'"
+        f" field_optionally_enclosed_by='\"' compression=gzip"
+        f" error_on_column_count_mismatch=false)"
+        f" match_by_column_name=case_insensitive",
+        f"merge into {table} t"
+        f" using ({_merged_rows(which_one)}) s"
+        f" on {' and '.join(f'equal_null(t.{k}, s.{k})' for k in keys)}"
+        f" when matched and ({' or '.join(f't.{v} is distinct from s.{v}' for v in values)})"
+        f" then update set {', '.join(f'{v} = s.{v}' for v in values)}"
+        f" when not matched then insert ({', '.join(all_columns)})"
+        f" values ({', '.join(f's.{c}' for c in all_columns)})",
+    ]
+
+
+def duplicates_sql(which_one):
+    """Query counting the staged keys of `which_one` that have several rows in
+    its target, which the merge would each set to the key's total."""
+    table, columns, keys = MERGE_INTO[which_one]
+    return (
+        f"select count(*) from (select 1 from {table} t"
+        f" join ({_merged_rows(which_one)}) s"
+        f" on {' and '.join(f'equal_null(t.{k}, s.{k})' for k in keys)}"
+        f" group by {', '.join(f't.{k}' for k in keys)} having count(*) > 1)"
+    )
+
+
+def collapse_sql(which_one, backup):
+    """Statements cloning the target of `which_one` to `backup`, then rebuilding
+    it at one row per natural key, its values summed. Columns not in
+    MERGE_INTO are left null; the clone keeps them and every original row."""
+    table, columns, keys = MERGE_INTO[which_one]
+    collapsed = f"{table.split('.')[-1]}_COLLAPSED"
+    values = [column for column, _ in columns.values() if column not in keys]
+    all_columns = ", ".join(keys + values)
+
+    return [
+        f"create table {backup} clone {table}",
+        f"create or replace temporary table {collapsed} as"
+        f" select {', '.join(keys + [f'sum({v}) as {v}' for v in values])}"
+        f" from {table} group by {', '.join(str(i + 1) for i in range(len(keys)))}",
+        # one statement, so a failure leaves the table as it was
+        f"insert overwrite into {table} ({all_columns})"
+        f" select {all_columns} from {collapsed}",
+    ]
+
+
+def file_hash(file):
+    digest = hashlib.sha1()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def upload_mode(which_one, merge):
+    # a PUT alone doesn't bring the table up to date
+    return "merged" if merge and which_one in MERGE_INTO else "put"
+
+
+def load_state(file=UPLOAD_STATE):
+    file = Path(file)
+    return json.loads(file.read_text()) if file.exists() else {}
+
+
+def save_state(state, file=UPLOAD_STATE):
+    file = Path(file)
+    tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, file)
+
+
+def convert_source(which_one):
+    xlsx_file, sheet_name, stage_file, _ = FILE_NAME[which_one]
+    from_xlsx_to_csv(xlsx_file, sheet_name, stage_file, **READ_OPTIONS[which_one])
+
+
+def convert_sources(sources, workers=WORKERS):
+    """Convert `sources` in a pool of `workers` processes (serially when there
+    is only one); yields (source, exception or None) as each one finishes."""
+    if len(sources) <= 1 or workers == 1:
+        for which_one in sources:
+            try:
+                convert_source(which_one)
+            except Exception as e:
+                yield which_one, e
+            else:
+                yield which_one, None
+        return
+
+    with ProcessPoolExecutor(max_workers=min(len(sources), workers)) as pool:
+        jobs = {pool.submit(convert_source, which_one): which_one for which_one in sources}
+        for job in as_completed(jobs):
+            yield jobs[job], job.exception()
+
+
+def put_source(session, which_one, parallel=PARALLEL, merge=True):
+    """PUT the converted chunks of `which_one` and merge them if it is in
+    MERGE_INTO; returns the status to print."""
+    stage_file, stage_name = FILE_NAME[which_one][2:]
+    chunks = Path(stage_file).with_name(f"{Path(stage_file).stem}_*.csv.gz")
+
+    # the previous upload may have had more chunks (or the old uncompressed csv)
+    session.sql(f"remove {stage_name} pattern='.*{Path(stage_file).stem}.*'").collect()
+    put_result = session.file.put(
+        str(chunks), stage_name, overwrite=True, auto_compress=False, parallel=parallel
+    )
+
+    status = ", ".join(sorted({row.status for row in put_result}))
+
+    if merge and which_one in MERGE_INTO:
+        *load, merge_into = merge_sql(which_one)
+        for sql in load:
+            session.sql(sql).collect()
+        if session.sql(duplicates_sql(which_one)).collect()[0][0]:
+            raise RuntimeError(
+                f"{MERGE_INTO[which_one][0]} has several rows per key; run "
+                f"`upload_data.py --collapse {which_one}` once, or use --no-merge"
+            )
+        inserted, updated = session.sql(merge_into).collect()[0]
+        status += f"; merged {inserted} new and {updated} changed rows"
+
+    return status
+
+
+def upload(session, which_one, parallel=PARALLEL, merge=True):
+    convert_source(which_one)
+    return put_source(session, which_one, parallel, merge)
+
+
+def run_batch(
+    sources,
+    force=False,
+    state_file=UPLOAD_STATE,
+    parallel=PARALLEL,
+    workers=WORKERS,
+    merge=True,
+):
+    state = load_state(state_file)
+
+    digests = {which_one: file_hash(FILE_NAME[which_one][0]) for which_one in sources}
+    changed = []
+    for which_one, digest in digests.items():
+        # {mode: sha1 of the workbook last uploaded in that mode}
+        uploaded = state.get(which_one)
+        if not isinstance(uploaded, dict):
+            state[which_one] = uploaded = {}  # from before modes: upload again
+        if not force and uploaded.get(upload_mode(which_one, merge)) == digest:
+            print(f"{which_one}: unchanged, skipped")
+        else:
+            changed.append(which_one)
+
+    # one session for the whole run, shared by the PUT threads; a source is
+    # PUT as soon as its conversion (in a worker process) is done
+    failed = []
+    with pooled_session() as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {}
+        for which_one, error in convert_sources(changed, workers):
+            if error is not None:
+                print(f"{which_one}: failed ({error})")
+                failed.append(which_one)
+            else:
+                jobs[pool.submit(put_source, session, which_one, parallel, merge)] = which_one
+
+        for job in as_completed(jobs):
+            which_one = jobs[job]
+            try:
+                print(f"{which_one}: {job.result()}")
+            except Exception as e:
+                print(f"{which_one}: failed ({e})")
+                failed.append(which_one)
+                continue
+            # a merge also PUT the chunks
+            for mode in {"put", upload_mode(which_one, merge)}:
+                state[which_one][mode] = digests[which_one]
+            save_state(state, state_file)  # a failed run keeps what already went up
+
+    if failed:
+        raise SystemExit(f"upload failed for {', '.join(sorted(failed))}")
+
+    return None
+
+
+def run_collapse(sources):
+    """Rebuild the tables of `sources` at the merge grain, each after a yes at
+    the prompt and a clone of the table."""
+    stamp = f"{datetime.now():%Y%m%d_%H%M%S}"
+    with pooled_session() as session:
+        for which_one in sources:
+            table, columns, keys = MERGE_INTO[which_one]
+            backup = f"{table}_BACKUP_{stamp}"
+            answer = input(
+                f"Sum {table} to one row per {', '.join(keys)}? Only "
+                f"{', '.join(column for column, _ in columns.values())} are kept; "
+                f"the table is cloned to {backup} first. [y/N] "
+            )
+            if answer.strip().lower() != "y":
+                print(f"{which_one}: left as it is")
+                continue
+            for sql in collapse_sql(which_one, backup):
+                session.sql(sql).collect()
+            print(f"{which_one}: collapsed; the old rows are in {backup}")
+
+    return None
+
+
+def run_menu():
+    # one session for the whole menu loop
+    with pooled_session() as session:
+        while True:
+            which_one = input(MENU_ITEMS).upper()
+
+            if which_one == "X":
+                print("Exited.")
+                break
+
+            print(upload(session, which_one))
+            print("\n")
+
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert the source workbooks to CSV and PUT them to their stages."
+    )
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        type=one_of(sorted(FILE_NAME), str.upper),
+        help=f"sources to upload ({', '.join(sorted(FILE_NAME))}); "
+        "none (and no --all) opens the menu",
+    )
+    parser.add_argument("--all", action="store_true", help="upload every source")
+    parser.add_argument(
+        "--force", action="store_true", help="upload even if the workbook is unchanged"
+    )
+    parser.add_argument(
+        "--state", default=UPLOAD_STATE, help="file with the hashes of the last uploads"
+    )
+    parser.add_argument(
+        "--parallel", type=int, default=PARALLEL, help="PUT threads per source"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=WORKERS, help="sources uploaded at a time"
+    )
+    parser.add_argument(
+        "--no-merge",
+        dest="merge",
+        action="store_false",
+        help="only PUT; don't merge EOD and Azure into their tables",
+    )
+    parser.add_argument(
+        "--collapse",
+        action="store_true",
+        help="instead of uploading, sum the tables of the given merged sources "
+        f"({', '.join(sorted(MERGE_INTO))}; default both) to one row per key, "
+        "after asking and cloning each",
+    )
+    args = parser.parse_args(argv)
+
+    if args.collapse:
+        not_merged = [which_one for which_one in args.sources if which_one not in MERGE_INTO]
+        if not_merged:
+            parser.error(f"--collapse: {', '.join(not_merged)} not merged into a table")
+        run_collapse(args.sources or sorted(MERGE_INTO))
+    elif args.all or args.sources:
+        run_batch(
+            sorted(FILE_NAME) if args.all else args.sources,
+            args.force,
+            args.state,
+            args.parallel,
+            args.workers,
+            args.merge,
         )
-    else:  # "E": employee, "H": holiday
-        from_xlsx_to_csv()
+    else:
+        run_menu()
 
-    put_result = session.file.put(stage_file, stage_name, overwrite=True)
+    return None
 
-    print(put_result[0].status)
-    print("\n")
 
-    session.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+usage_csv.py
+Streaming reader for the Azure sponsorship usage exports.
+
+The exports are read CHUNKSIZE rows at a time, only the columns asked for,
+with the text columns as categoricals. Each chunk is summed to the requested
+keys and folded into a running total, so peak memory depends on the number of
+distinct keys rather than the size of the export.
+
+    df = aggregate_usage(files, ["Date", "ServiceName"])
+
+A directory of monthly exports goes through `aggregate_exports`, which keeps
+each file's aggregate as Parquet and a JSON manifest of the files' hashes, so
+only new or changed exports are parsed (in parallel) on the next load. Where
+exports overlap, each day is taken from the newest export that has it.
+
+    df = aggregate_exports(list_exports(path, "*.csv"), ["Date", "ServiceName"])
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from excel_cache import CACHE_DIR_NAME
+
+# the sponsorship pages cache these frames with st.cache_resource; with
+# Copy-on-Write, frames derived from them never write through to the cache
+pd.set_option("mode.copy_on_write", True)
+
+CHUNKSIZE = 200_000
+
+
+def aggregate_usage(files, keys, value="Cost", date_column="Date", chunksize=CHUNKSIZE):
+    """Sum `value` over `keys` across the CSV `files`. `date_column`, when one
+    of the keys, is grouped on its text and parsed once at the end."""
+    total = None
+
+    for file in files:
+        chunks = pd.read_csv(
+            file,
+            usecols=keys + [value],
+            dtype={**{key: "category" for key in keys}, value: "float64"},
+            chunksize=chunksize,
+        )
+        for chunk in chunks:
+            part = chunk.groupby(keys, observed=True, dropna=False)[value].sum()
+            if total is not None:
+                # chunk categories differ, so the fold runs on plain values
+                part = pd.concat([total, part]).groupby(
+                    level=list(range(len(keys))), observed=True, dropna=False
+                ).sum()
+            total = part
+
+    if total is None:
+        return pd.DataFrame(columns=keys + [value])
+
+    # the aggregate is small; plain columns keep the pages' groupbys unchanged
+    df = total.reset_index().astype({key: object for key in keys})
+    if date_column in keys:
+        df[date_column] = pd.to_datetime(df[date_column])
+    return df
+
+
+def _sha1(file):
+    digest = hashlib.sha1()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    # unique per write: sessions loading the same exports share one process
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    os.close(fd)
+    tmp = Path(tmp)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def list_exports(directory, pattern="*.csv"):
+    """`(path, size, mtime)` of every export matching `pattern`. Passing this to
+    a cached loader makes a new or changed export invalidate the cache."""
+    return tuple(
+        (str(file), file.stat().st_size, file.stat().st_mtime_ns)
+        for file in sorted(Path(directory).glob(pattern))
+    )
+
+
+def aggregate_exports(
+    exports, keys, date_column="Date", cache_dir=None, max_workers=None
+):
+    """`aggregate_usage` over the files of `list_exports`, one file at a time.
+    Per-file aggregates are kept as Parquet under `cache_dir` with a manifest
+    of the files' sha1; files that are new or whose content changed are parsed
+    in a pool of `max_workers` processes (serially when there is only one).
+    A day found in several exports is taken from the one modified last."""
+    if date_column not in keys:
+        raise ValueError(f"keys must include {date_column!r} to resolve overlapping exports")
+    if not exports:
+        return aggregate_usage([], keys)
+
+    files = [Path(path) for path, _, _ in exports]
+    cache_dir = Path(cache_dir) if cache_dir else files[0].parent / CACHE_DIR_NAME
+    keys_digest = hashlib.sha1(repr(keys).encode()).hexdigest()[:16]
+    manifest_file = cache_dir / f"usage.{keys_digest}.json"
+    manifest = json.loads(manifest_file.read_text()) if manifest_file.exists() else {}
+
+    entries, stale = {}, []
+    for file, (_, size, mtime) in zip(files, exports):
+        entry = manifest.get(file.name, {})
+        if (entry.get("size"), entry.get("mtime")) != (size, mtime):
+            # touched: only re-parse when the content really changed
+            entry = {**entry, "size": size, "mtime": mtime, "sha1": _sha1(file)}
+        parquet = f"{file.name}.{keys_digest}.{entry['sha1'][:16]}.parquet"
+        if entry.get("parquet") != parquet or not (cache_dir / parquet).exists():
+            stale.append(file)
+        entries[file.name] = {**entry, "parquet": parquet}
+
+    if len(stale) <= 1 or max_workers == 1:
+        parsed = {file: aggregate_usage([file], keys) for file in stale}
+    else:
+        workers = min(len(stale), max_workers or os.cpu_count())
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = {file: pool.submit(aggregate_usage, [file], keys) for file in stale}
+        parsed = {file: job.result() for file, job in jobs.items()}
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for file, df in parsed.items():
+        _write_atomic(
+            cache_dir / entries[file.name]["parquet"],
+            lambda tmp: df.to_parquet(tmp, index=False),
+        )
+
+    # drop the aggregates of exports that were replaced or removed
+    for name, entry in manifest.items():
+        if entry.get("parquet") and entry["parquet"] != entries.get(name, {}).get("parquet"):
+            (cache_dir / entry["parquet"]).unlink(missing_ok=True)
+
+    _write_atomic(
+        manifest_file, lambda tmp: tmp.write_text(json.dumps(entries, indent=2))
+    )
+
+    # oldest export first; a range export left in the folder must not add
+    # its days on top of the monthly exports that have them too
+    order = sorted(zip(files, exports), key=lambda item: (item[1][2], item[0].name))
+    frames = [
+        parsed[file]
+        if file in parsed
+        else pd.read_parquet(cache_dir / entries[file.name]["parquet"])
+        for file, _ in order
+    ]
+    df = pd.concat(frames, keys=range(len(frames)), names=["export", None])
+    df = df.reset_index(level="export")
+    newest = df.groupby(date_column, dropna=False)["export"].transform("max")
+    return (
+        df[df["export"] == newest]
+        .drop(columns="export")
+        .sort_values(keys, ignore_index=True)
+    )
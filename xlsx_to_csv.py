@@ -1,17 +1,137 @@
-import pandas as pd
+"""
+xlsx_to_csv.py
+Streams a worksheet to CSV with openpyxl in read-only mode: rows are written
+as they are read, so memory stays flat whatever the size of the sheet.
 
-name = "Azure Usage 2024-07"
-name2 = name.replace(" ", "_")
-name2 = name2.replace("-", "_")
-xlsx_file = f"/Users/shaun/projects/mis/data/{name}.xlsx"
-sheet_name = "Sheet1"
-csv_file = f"/Users/shaun/projects/mis/data/csv/{name2}.csv"
+    convert(xlsx_file, "Sheet1", csv_file, skiprows=2)
 
-df = pd.read_excel(
+`skiprows` rows are dropped before the header row, `usecols` picks columns by
+header name, and `date_format` maps a column to the strftime format its dates
+are written with (other dates are written as pandas would). With `chunk_rows`
+the output is split into <name>_000.csv, <name>_001.csv, ... each with the
+header; `compression="gzip"` writes .csv.gz files.
+"""
+
+import csv
+import gzip
+from datetime import date, datetime, time
+from itertools import islice
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+
+def chunk_file(csv_file, i, compression=None):
+    csv_file = Path(csv_file)
+    suffix = ".csv.gz" if compression == "gzip" else ".csv"
+    return csv_file.with_name(f"{csv_file.stem}_{i:03}{suffix}")
+
+
+def _open(file, compression):
+    if compression == "gzip":
+        return gzip.open(file, "wt", newline="", encoding="utf-8")
+    return open(file, "w", newline="", encoding="utf-8")
+
+
+def _formatter(fmt):
+    def format_value(value):
+        if isinstance(value, datetime):
+            if fmt:
+                return value.strftime(fmt)
+            if value.time() == time(0):
+                return value.strftime("%Y-%m-%d")
+            return value.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(value, date) and fmt:
+            return value.strftime(fmt)
+        return value
+
+    return format_value
+
+
+def convert(
     xlsx_file,
-    sheet_name=sheet_name,
-    skiprows=2,
-    date_format={"UsageDate": "%Y-%m-%d %H:%M:%S"},
-    engine="openpyxl",
-)
-df.to_csv(csv_file, index=False, sep=",")
+    sheet_name,
+    csv_file,
+    skiprows=0,
+    usecols=None,
+    sep=",",
+    date_format=None,
+    chunk_rows=None,
+    compression=None,
+):
+    """Write `sheet_name` of `xlsx_file` to CSV; returns the files written."""
+    workbook = load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        # the <dimension> some writers leave stale would cut rows and columns
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = next(islice(rows, skiprows, None), None)
+        if header is None:
+            raise ValueError(f"no header row in {sheet_name} after {skiprows} rows")
+        header = [
+            f"Unnamed: {i}" if name is None else str(name)
+            for i, name in enumerate(header)
+        ]
+
+        if usecols is None:
+            indices = list(range(len(header)))
+        else:
+            missing = [name for name in usecols if name not in header]
+            if missing:
+                raise ValueError(f"usecols not found in {sheet_name}: {missing}")
+            # keep the sheet's column order, as read_excel does
+            indices = [i for i, name in enumerate(header) if name in usecols]
+
+        formats = [_formatter((date_format or {}).get(header[i])) for i in indices]
+        out_header = [header[i] for i in indices]
+
+        files, f, writer, written = [], None, None, 0
+
+        def next_file():
+            nonlocal f, writer, written
+            if f is not None:
+                f.close()
+            files.append(
+                chunk_file(csv_file, len(files), compression)
+                if chunk_rows
+                else Path(csv_file)
+            )
+            f = _open(files[-1], compression)
+            writer = csv.writer(f, delimiter=sep)
+            writer.writerow(out_header)
+            written = 0
+
+        next_file()
+        for row in rows:
+            values = [
+                fmt(row[i] if i < len(row) else None) for fmt, i in zip(formats, indices)
+            ]
+            if all(value is None for value in values):
+                continue  # blank rows are dropped, as read_excel does
+            if chunk_rows and written == chunk_rows:
+                next_file()
+            writer.writerow(values)
+            written += 1
+        f.close()
+    finally:
+        workbook.close()
+
+    return files
+
+
+if __name__ == "__main__":
+    name = "Azure Usage 2024-07"
+    name2 = name.replace(" ", "_")
+    name2 = name2.replace("-", "_")
+    xlsx_file = f"/Users/shaun/projects/mis/data/{name}.xlsx"
+    sheet_name = "Sheet1"
+    csv_file = f"/Users/shaun/projects/mis/data/csv/{name2}.csv"
+
+    convert(
+        xlsx_file,
+        sheet_name,
+        csv_file,
+        skiprows=2,
+        date_format={"UsageDate": "%Y-%m-%d %H:%M:%S"},
+    )